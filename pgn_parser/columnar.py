@@ -0,0 +1,194 @@
+"""Many games held as flat columns rather than objects
+
+A Game is a tree of Movetext, Move and Ply objects, which is slow to walk and
+large to hold for millions of games. A GameBatch keeps the mainline plies of
+every game it is given in typed arrays, one row per ply, so questions across
+the whole batch are loops over a few arrays. The arrays support the buffer
+protocol, so numpy.frombuffer can view them without copying.
+"""
+from array import array
+import pgn_parser.parser as parser
+from pgn_parser.pgn import SANS, Actions, san_code, san_typecode
+
+
+# The results a game can have, indexed by the codes in GameBatch.result
+RESULTS = ("*", "1-0", "0-1", "1/2-1/2")
+_RESULT_CODES = dict((r, i) for i, r in enumerate(RESULTS))
+
+
+class GameBatch:
+    """The mainline plies, tags and results of a batch of games, as columns
+
+    Variations and the comments on whole moves and games are not kept.
+
+    Usage:
+        batch = GameBatch.parse(texts)
+        for row in batch.plies(0):
+            print(batch.ply_san(row), batch.comment(row))
+
+    Attributes:
+        game: For each ply, the index of its game in the batch
+        ply: For each ply, its index in its game counting from 0 for white's
+            first move, so games starting part way through keep their numbering
+        san: For each ply, the code of its SAN in pgn.SANS, the same code
+            as its Ply has, so batches made in one process can be compared.
+            Its typecode is 'H', widened to 'I' once a code does not fit.
+        nag_start: For each ply, where its nags start in nags, with one more
+            entry at the end so ply i has nags[nag_start[i]:nag_start[i + 1]]
+        nags: The number of every nag, "$14" is 14
+        comment_start, comment_end: For each ply, the span of its comment in
+            text, empty if it has none
+        game_start: For each game, its first row, with one more entry at the
+            end, as with nag_start
+        result: For each game, the index of its result in RESULTS
+        tags: A dict of tag name to a list of each game's value, None for a
+            game without that tag
+    """
+
+    def __init__(self):
+        self.game = array('I')
+        self.ply = array('I')
+        self.san = array(san_typecode())
+        self.nag_start = array('I', [0])
+        self.nags = array('I')
+        self.comment_start = array('Q')
+        self.comment_end = array('Q')
+        self.game_start = array('Q', [0])
+        self.result = array('B')
+        self.tags = {}
+        self._text = []
+        self._size = 0
+
+    @classmethod
+    def from_games(cls, games):
+        """Creates a GameBatch of the Games in an iterable"""
+        batch = cls()
+        batch.extend(games)
+        return batch
+
+    @classmethod
+    def parse(cls, texts, encoding="utf-8"):
+        """Parses games straight into a GameBatch, without making Game objects
+
+        Args:
+            texts: An iterable of the str or bytes of each game, such as the
+                texts of stream.read_games
+            encoding: The encoding of bytes texts
+
+        Raises:
+            ParseError for the first game that fails to parse
+        """
+        batch = cls()
+        games = parser.parse_batch(texts, actions=_BatchActions(batch), encoding=encoding,
+                                   engine='direct')
+        for game in games:
+            if game is not None:
+                # Only a game the default engine had to parse comes back whole
+                batch.append(game)
+        return batch
+
+    def __len__(self):
+        """The number of games"""
+        return len(self.result)
+
+    def append(self, game):
+        """Adds the mainline of a Game to the batch"""
+        plies = []
+        for move in game.movetext:
+            number = 2 * (move.move_number - 1)
+            for offset, ply in ((0, move.white), (1, move.black)):
+                if ply.code:
+                    plies.append((number + offset, ply.code, ply.nags, ply.comment))
+        self._add(game.tag_pairs.items(), plies, str(game.score))
+
+    def extend(self, games):
+        """Adds the mainline of each Game in an iterable"""
+        for game in games:
+            self.append(game)
+
+    def plies(self, index):
+        """The rows of the plies of the game at index, as a range"""
+        return range(self.game_start[index], self.game_start[index + 1])
+
+    def ply_san(self, row):
+        """The SAN of the ply at row"""
+        return SANS[self.san[row]]
+
+    def ply_nags(self, row):
+        """The nag numbers of the ply at row"""
+        return self.nags[self.nag_start[row]:self.nag_start[row + 1]]
+
+    def comment(self, row):
+        """The comment of the ply at row, "" if it has none"""
+        return self.text[self.comment_start[row]:self.comment_end[row]]
+
+    @property
+    def text(self):
+        """Every comment in the batch, one after another"""
+        if len(self._text) != 1:
+            self._text = [''.join(self._text)]
+        return self._text[0]
+
+    def _add(self, tags, plies, result):
+        """Adds a game from its (name, value) tags, its plies as (index, SAN
+        code, nags, comment) and its result
+        """
+        index = len(self.result)
+        for number, code, nags, comment in plies:
+            self.game.append(index)
+            self.ply.append(number)
+            try:
+                self.san.append(code)
+            except OverflowError:
+                # SANS has outgrown 'H'
+                self.san = array('I', self.san)
+                self.san.append(code)
+            if nags:
+                self.nags.extend(int(n[1:]) for n in nags)
+            self.nag_start.append(len(self.nags))
+            self.comment_start.append(self._size)
+            if comment:
+                self._text.append(comment)
+                self._size += len(comment)
+            self.comment_end.append(self._size)
+        self.game_start.append(len(self.game))
+        self.result.append(_RESULT_CODES[result])
+
+        for name, value in tags:
+            column = self.tags.get(name)
+            if column is None:
+                column = self.tags[name] = [None] * index
+            column.append(value)
+        for column in self.tags.values():
+            if len(column) == index:
+                column.append(None)
+
+
+class _BatchActions(Actions):
+    """Adds each game the direct engine parses to a GameBatch, passing plain
+    tuples and lists up in place of the Game objects
+    """
+
+    def __init__(self, batch):
+        self.batch = batch
+
+    def build_tag_pairs(self, pairs):
+        return pairs
+
+    def build_move(self, move_number, white, wnags, wcomment, wvars, black, bnags, bcomment,
+                   bvars, mcomment):
+        return (2 * (int(move_number[:-1]) - 1), white if white != ".." else "", wnags, wcomment,
+                black, bnags, bcomment if black else None)
+
+    def build_movetext(self, moves):
+        return moves
+
+    def build_game(self, tag_pairs, gcomment, movetext, score):
+        plies = []
+        for number, white, wnags, wcomment, black, bnags, bcomment in movetext:
+            if white:
+                plies.append((number, san_code(white), wnags, wcomment))
+            if black:
+                plies.append((number + 1, san_code(black), bnags, bcomment))
+        self.batch._add(tag_pairs, plies, score or "*")
+        return None
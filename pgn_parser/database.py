@@ -0,0 +1,270 @@
+"""Random access to the games of a large pgn file
+
+The file is memory mapped and scanned once for the offset of every game, after
+which any game can be parsed on its own without reading those before it.
+
+The index can also be kept in a sidecar file next to the pgn, so reopening the
+same file later maps the saved index instead of scanning again.
+"""
+import mmap
+import os
+import re
+import struct
+import sys
+import zlib
+from array import array
+from bisect import bisect_left
+import pgn_parser.parser as parser
+import pgn_parser.stream as stream
+from pgn_parser.pgn import Actions
+
+
+# The tags kept for every game in a sidecar index
+SUMMARY_TAGS = ("White", "Black", "Date", "Result", "ECO")
+
+_MAGIC = b'PGNIDX01'
+# magic, byte order, indexed file size, file mtime in ns, game count,
+# crc32 of the indexed tail, length of that tail, tag names length, blob length
+_HEADER = struct.Struct('<8sc7xQqQIIQQ')
+# How much of the end of the indexed file is checked to detect an append
+_TAIL = 4096
+_TAG = re.compile(rb'\[\s?([A-Za-z0-9_]+)\s?"([^"]*)"')
+
+
+def _pad(n):
+    """Rounds n up to a multiple of 8, to keep the arrays aligned"""
+    return (n + 7) & ~7
+
+
+class PGNDatabase:
+    """A pgn file of many games, indexed for access by game number
+
+    Usage:
+        db = PGNDatabase("database.pgn")
+        len(db)   # The number of games
+        db[1234]  # The Game at index 1234, parsed when asked for
+    """
+
+    def __init__(self, path, actions=None, encoding="utf-8", sidecar=False, fallback="latin-1"):
+        """Opens and indexes the file at `path`
+
+        Args:
+            path: The path of the pgn file
+            actions: The actions to parse games with, a new Actions() by default
+            encoding: The encoding of the file
+            fallback: The encoding of tag values and comments that are not
+                valid in `encoding`, as with parser.parse
+            sidecar: True to keep the index in `path` + ".idx", or the path of
+                the index file to use. An up to date index is mapped rather
+                than rebuilt, if games were only appended since it was written
+                just the new games are indexed.
+        """
+        self.path = path
+        self.actions = actions if actions is not None else Actions()
+        self.encoding = encoding
+        self.fallback = fallback
+        self._file = open(path, 'rb')
+        self._stat = os.fstat(self._file.fileno())
+        if self._stat.st_size:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            if stream.is_compressed(self._map[:8]):
+                self._map.close()
+                self._file.close()
+                raise ValueError("{} is compressed, it can only be read as a "
+                                 "stream, with pgn.iter_games".format(path))
+        else:
+            # An empty file cannot be mapped, but has no games to index either
+            self._map = b''
+        self._index_map = None
+        self._summaries = None
+
+        if sidecar is True:
+            sidecar = path + ".idx"
+        self.sidecar = sidecar or None
+        if self.sidecar is None:
+            self._starts = array('Q')
+            self._ends = array('Q')
+            stream.scan_games(self._map, 0, True, self._starts, self._ends)
+        else:
+            self._open_sidecar()
+
+    def __len__(self):
+        return len(self._starts)
+
+    def __getitem__(self, i):
+        """Parses and returns the Game at index `i`"""
+        return parser.parse(self.text(i), actions=self.actions, encoding=self.encoding,
+                            fallback=self.fallback)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def span(self, i):
+        """Returns the (offset, length) in bytes of the game at index `i`"""
+        start = self._starts[i]
+        return start, self._ends[i] - start
+
+    def find(self, offset, lo=0):
+        """Returns the index of the first game starting at or after `offset`"""
+        return bisect_left(self._starts, offset, lo)
+
+    def text(self, i):
+        """Returns the unparsed bytes of the game at index `i`"""
+        return self._map[self._starts[i]:self._ends[i]]
+
+    def tags(self, i):
+        """Returns a dict of the SUMMARY_TAGS of the game at index `i`
+
+        With a sidecar these are read from the index, otherwise they are read
+        from the game's tag section. Tags the game does not have are left out.
+        """
+        if self._summaries is None:
+            record = self._summary(i)
+        else:
+            offsets, blob = self._summaries
+            record = bytes(blob[offsets[i]:offsets[i + 1]])
+        values = record.split(b'\x00')
+        return {k: self._decode(v) for k, v in zip(SUMMARY_TAGS, values) if v}
+
+    def _decode(self, value):
+        # As BytesInput decodes the values of a parsed game
+        try:
+            return value.decode(self.encoding)
+        except UnicodeDecodeError:
+            return value.decode(self.fallback)
+
+    def close(self):
+        """Unmaps and closes the file"""
+        self._release_index()
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+    def _summary(self, i):
+        """Reads the summary record of game `i` from its tag section"""
+        start = self._starts[i]
+        end = stream.tags_end(self._map, start)
+        found = dict(_TAG.findall(self._map[start:end]))
+        return b'\x00'.join(found.get(k.encode('ascii'), b'') for k in SUMMARY_TAGS)
+
+    def _open_sidecar(self):
+        """Maps the sidecar index, bringing it up to date first if needed"""
+        header = self._load_sidecar()
+        if header is None:
+            self._release_index()
+            self._starts, self._ends = array('Q'), array('Q')
+            offsets, blob = array('Q', [0]), bytearray()
+            pos = 0
+        else:
+            size, mtime = header
+            if size == self._stat.st_size and mtime == self._stat.st_mtime_ns:
+                return
+            # Games were appended, the last game indexed may have been added to
+            # so it is indexed again along with the new games
+            keep = max(len(self._starts) - 1, 0)
+            pos = self._starts[keep] if len(self._starts) else 0
+            starts = array('Q', self._starts[:keep])
+            ends = array('Q', self._ends[:keep])
+            offsets = array('Q', self._summaries[0][:keep + 1])
+            blob = bytearray(self._summaries[1][:offsets[-1]])
+            self._release_index()
+            self._starts, self._ends = starts, ends
+
+        first = len(self._starts)
+        stream.scan_games(self._map, pos, True, self._starts, self._ends)
+        for i in range(first, len(self._starts)):
+            blob += self._summary(i)
+            offsets.append(len(blob))
+        self._summaries = (offsets, blob)
+        self._write_sidecar()
+
+    def _load_sidecar(self):
+        """Maps the sidecar index if it is still valid for the file
+
+        Returns:
+            The (size, mtime) the file had when indexed, or None if there is
+            no usable index and it must be built from scratch
+        """
+        try:
+            f = open(self.sidecar, 'rb')
+        except OSError:
+            return None
+        with f:
+            try:
+                m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                return None
+        fields = _HEADER.unpack_from(m) if len(m) >= _HEADER.size else None
+        if (fields is None or fields[0] != _MAGIC
+                or fields[1] != sys.byteorder[0].encode('ascii')):
+            m.close()
+            return None
+        _, _, size, mtime, count, crc, tail, names_len, blob_len = fields
+        if len(m) != _HEADER.size + _pad(names_len) + 8 * (3 * count + 1) + blob_len:
+            m.close()
+            return None
+        names = m[_HEADER.size:_HEADER.size + names_len].split(b'\x00')
+        if names != [k.encode('ascii') for k in SUMMARY_TAGS]:
+            m.close()
+            return None
+        unchanged = size == self._stat.st_size and mtime == self._stat.st_mtime_ns
+        if not unchanged and (size >= self._stat.st_size
+                              or zlib.crc32(self._map[size - tail:size]) != crc):
+            # The file was rewritten rather than appended to. Only growth is
+            # taken as an append, an edit that keeps the size is not caught
+            # by the crc of the tail.
+            m.close()
+            return None
+
+        view = memoryview(m)
+        pos = _HEADER.size + _pad(names_len)
+        arrays = []
+        for n in (count, count, count + 1):
+            arrays.append(view[pos:pos + 8 * n].cast('Q'))
+            pos += 8 * n
+        self._starts, self._ends, offsets = arrays
+        self._summaries = (offsets, view[pos:pos + blob_len])
+        self._index_map = (m, view)
+        return size, mtime
+
+    def _write_sidecar(self):
+        """Saves the index, replacing any old sidecar in one step"""
+        size = self._stat.st_size
+        tail = min(size, _TAIL)
+        crc = zlib.crc32(self._map[size - tail:size])
+        names = b'\x00'.join(k.encode('ascii') for k in SUMMARY_TAGS)
+        offsets, blob = self._summaries
+        header = _HEADER.pack(_MAGIC, sys.byteorder[0].encode('ascii'), size,
+                              self._stat.st_mtime_ns, len(self._starts), crc,
+                              tail, len(names), len(blob))
+        tmp = "{}.{}.tmp".format(self.sidecar, os.getpid())
+        try:
+            with open(tmp, 'wb') as f:
+                f.write(header)
+                f.write(names.ljust(_pad(len(names)), b'\x00'))
+                self._starts.tofile(f)
+                self._ends.tofile(f)
+                offsets.tofile(f)
+                f.write(blob)
+            os.replace(tmp, self.sidecar)
+        except OSError:
+            # The index still works from memory, it just is not saved
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def _release_index(self):
+        """Drops any views into a mapped sidecar and unmaps it"""
+        if self._index_map is None:
+            return
+        m, view = self._index_map
+        self._starts = self._ends = self._summaries = None
+        self._index_map = None
+        view.release()
+        m.close()
@@ -0,0 +1,311 @@
+"""A faster engine for the pgn grammar, used by parser.parse(engine="fast")
+
+The canopy parser matches the input one character at a time, building a node
+for every character. This engine follows the same grammar (parser.peg) but
+matches each run of a move that cannot nest, from its move number up to its
+first variation, with a single compiled regex. The same Actions callbacks are
+given the same elements, so it builds an identical Game.
+
+Only input the grammar accepts is handled here, for anything else the canopy
+parser is run to raise its detailed ParseError.
+"""
+import re
+from pgn_parser.parser import BytesInput, Parser, TreeNode, TreeNode3
+
+
+class _Failed(Exception):
+    """The input does not match the grammar"""
+
+
+class _Patterns:
+    """The grammar's rules as regexes, compiled for str or bytes input"""
+
+    def __init__(self, encode, ws):
+        san = (r'(?:[a-h][1-8]'
+               r'|[KQRNBP][a-h][1-8]x?[a-h][1-8]|[KQRNBP]x?[a-h][1-8]'
+               r'|[KQRNBP][a-h]x?[a-h][1-8]|[KQRNBP][1-8]x?[a-h][1-8]'
+               r'|[a-h]x[a-h][1-8]|O-O-O|O-O|\.\.)(?:=[KQRNB])?[+#]?')
+        nags = r'(?:\$[0-9]+' + ws + r'?)+'
+        comment = r'(?:\{([^}]*)\}' + ws + r'?)?'
+        dlm = ws + '?'
+
+        def compile(pattern):
+            return re.compile(encode(pattern))
+
+        self.tag_pair = compile(r'\[' + dlm + r'([A-Za-z0-9_]+)' + dlm + r'"([^"]*)"'
+                                + dlm + r'\]' + dlm)
+        self.game_comment = compile(r'(\n?)' + comment)
+        # A move is matched up to each place a variation can start
+        white = r'([0-9]+\.)' + dlm + '(' + san + ')' + dlm + '(' + nags + ')?' + dlm + comment
+        black = dlm + '(' + san + ')?' + dlm + '(' + nags + ')?' + dlm + comment
+        self.white = compile(white)
+        self.black = compile(black)
+        self.move_comment = compile(dlm + comment)
+        # A whole move, correct if it has no variations, which the empty
+        # groups mark where to look for
+        self.move = compile(white + '()' + black + '()' + dlm + comment)
+        self.open = encode('(')
+        self.nag = compile(r'\$[0-9]+' + dlm)
+        self.open_variation = compile(r'\(' + dlm)
+        self.close_variation = compile(r'\)' + dlm)
+        self.score = compile(r'(1-0|0-1|1/2-1/2|\*)?' + ws + '*')
+
+
+_STR = _Patterns(lambda s: s, r'\s')
+# Bytes are matched as the canopy parser sees them through BytesInput, where
+# only ASCII characters can be whitespace
+_BYTES = _Patterns(lambda s: s.encode('ascii'), r'[\t\n\x0b\x0c\r\x1c-\x1f ]')
+
+
+class FastParser:
+    def __init__(self, input, actions, types=None, encoding='utf-8', fallback='latin-1'):
+        self._actions = actions
+        self._types = types
+        self._encoding = encoding
+        self._fallback = fallback
+        self.reset(input)
+
+    def reset(self, input):
+        """Readies the parser to parse another input, see Parser.reset"""
+        self._raw = input
+        if isinstance(input, str):
+            self._input = input
+            self._re = _STR
+        else:
+            self._input = BytesInput(input, self._encoding, self._fallback)
+            self._re = _BYTES
+
+    def parse(self):
+        try:
+            return self._read_game()
+        except _Failed:
+            # Let the canopy parser find and describe the problem, which
+            # includes input nested too deeply for it to parse
+            parser = Parser(self._raw, self._actions, self._types,
+                            self._encoding, self._fallback, track=True)
+            return parser.parse()
+
+    # What each part of the grammar is built into, the nodes the canopy parser
+    # hands to the Actions callbacks
+
+    def _empty(self, pos):
+        """An optional part that is not there"""
+        return TreeNode(self._input, pos, None, pos)
+
+    def _node(self, m, group):
+        """A TreeNode of an optional group, empty if it did not match"""
+        start = m.start(group)
+        if start < 0:
+            return self._empty(m.end())
+        return TreeNode(self._input, start, None, m.end(group))
+
+    def _comment(self, m, group):
+        """The result of make_comment, or an empty TreeNode if no comment"""
+        start = m.start(group)
+        if start < 0:
+            return self._empty(m.end())
+        body = TreeNode(self._input, start, None, m.end(group))
+        return self._actions.make_comment(self._input, start - 1, m.end(), [None, body, None, None])
+
+    def _nags(self, m, group):
+        start = m.start(group)
+        if start < 0:
+            return self._empty(m.end())
+        end = m.end(group)
+        nags = [TreeNode(self._input, n.start(), None, n.end())
+                for n in self._re.nag.finditer(self._raw, start, end)]
+        return TreeNode(self._input, start, nags, end)
+
+    def _tag_pair(self, m):
+        elements = [None, None, self._node(m, 1), None, None, self._node(m, 2),
+                    None, None, None, None]
+        return self._actions.make_tag_pair(self._input, m.start(), m.end(), elements)
+
+    def _tag_pairs(self, end, tags):
+        return self._actions.make_tag_pairs(self._input, 0, end, tags)
+
+    def _move(self, start, end, elements):
+        return TreeNode3(self._input, start, elements, end)
+
+    def _movetext(self, start, end, moves):
+        return self._actions.make_movetext(self._input, start, end, moves)
+
+    def _variation(self, start, end, movetext):
+        elements = [None, None, movetext, None, None]
+        return self._actions.make_variation(self._input, start, end, elements)
+
+    def _variations(self, start, end, variations):
+        return self._actions.make_variations(self._input, start, end, variations)
+
+    def _game(self, elements):
+        return self._actions.make_game(self._input, 0, len(self._raw), elements)
+
+    def _read_game(self):
+        raw = self._raw
+        pos, tags = 0, []
+        m = self._re.tag_pair.match(raw, pos)
+        while m:
+            tags.append(self._tag_pair(m))
+            pos = m.end()
+            m = self._re.tag_pair.match(raw, pos)
+        tag_pairs = self._tag_pairs(pos, tags)
+
+        m = self._re.game_comment.match(raw, pos)
+        newline, gcomment = self._node(m, 1), self._comment(m, 2)
+        movetext, pos = self._read_movetext(m.end())
+
+        m = self._re.score.match(raw, pos)
+        if m.end() != len(raw):
+            raise _Failed()
+        score = self._node(m, 1)
+        return self._game([tag_pairs, newline, gcomment, movetext, score, self._empty(m.end())])
+
+    def _read_movetext(self, pos):
+        # Variations are read with a stack of the movetexts they are nested
+        # in rather than by recursing, so there is no limit on their depth
+        raw, re_ = self._raw, self._re
+        node, nags, comment, empty = self._node, self._nags, self._comment, self._empty
+        stack = []
+        frame = _Movetext(pos)
+        while True:
+            if frame.elements is None:
+                # Between moves, read the next or end the movetext
+                move = pos
+                m = re_.move.match(raw, pos)
+                whole = (m is not None and raw[m.start(5):m.start(5) + 1] != re_.open
+                         and raw[m.start(9):m.start(9) + 1] != re_.open)
+                if not whole:
+                    m = re_.white.match(raw, pos)
+                if m is None:
+                    movetext = self._movetext(frame.start, pos, frame.moves)
+                    if not stack:
+                        return movetext, pos
+                    frame = stack.pop()
+                    m = re_.close_variation.match(raw, pos)
+                    if m is None:
+                        # The "(" can be matched by nothing else, so the game fails
+                        raise _Failed()
+                    frame.variations.append(self._variation(frame.opened, m.end(), movetext))
+                    pos = m.end()
+                    continue
+
+                elements = [node(m, 1), None, node(m, 2), None, nags(m, 3), None, comment(m, 4),
+                            None, None, None, None, None, None, None, None, None, None]
+                if whole:
+                    # No variations, so the move matched in one go
+                    elements[7] = empty(m.start(5))
+                    elements[9], elements[11], elements[13] = node(m, 6), nags(m, 7), comment(m, 8)
+                    elements[14] = empty(m.start(9))
+                    elements[16] = comment(m, 10)
+                    pos = m.end()
+                    frame.moves.append(self._move(move, pos, elements))
+                    continue
+                frame.move, frame.elements = move, elements
+                frame.variations, frame.variations_start = [], m.end()
+                pos = m.end()
+                continue
+
+            # After a ply, read its variations one at a time
+            m = re_.open_variation.match(raw, pos)
+            if m is not None:
+                frame.opened = pos
+                stack.append(frame)
+                frame = _Movetext(m.end())
+                pos = m.end()
+                continue
+            if frame.variations:
+                variations = self._variations(frame.variations_start, pos, frame.variations)
+            else:
+                variations = empty(pos)
+            elements = frame.elements
+            if not frame.black:
+                elements[7] = variations
+                m = re_.black.match(raw, pos)
+                elements[9], elements[11], elements[13] = node(m, 1), nags(m, 2), comment(m, 3)
+                frame.black = True
+                frame.variations, frame.variations_start = [], m.end()
+                pos = m.end()
+            else:
+                elements[14] = variations
+                m = re_.move_comment.match(raw, pos)
+                elements[16] = comment(m, 1)
+                pos = m.end()
+                frame.moves.append(self._move(frame.move, pos, elements))
+                frame.elements = None
+                frame.black = False
+
+
+class DirectParser(FastParser):
+    """Builds the Game straight from the matched text, with no parse tree
+
+    The actions are given plain values rather than nodes, through their
+    build_* methods, see pgn.Actions.
+    """
+
+    def _empty(self, pos):
+        return None
+
+    def _node(self, m, group):
+        start = m.start(group)
+        if start < 0:
+            return ''
+        return self._input[start:m.end(group)]
+
+    def _comment(self, m, group):
+        start = m.start(group)
+        if start < 0:
+            return None
+        return self._actions.build_comment(self._input[start:m.end(group)])
+
+    def _nags(self, m, group):
+        start = m.start(group)
+        if start < 0:
+            return None
+        return [self._input[n.start():n.end()]
+                for n in self._re.nag.finditer(self._raw, start, m.end(group))]
+
+    def _tag_pair(self, m):
+        return self._node(m, 1), self._node(m, 2)
+
+    def _tag_pairs(self, end, tags):
+        return self._actions.build_tag_pairs(tags)
+
+    def _move(self, start, end, e):
+        return self._actions.build_move(e[0], e[2], e[4], e[6], e[7], e[9], e[11], e[13], e[14], e[16])
+
+    def _movetext(self, start, end, moves):
+        return self._actions.build_movetext(moves)
+
+    def _variation(self, start, end, movetext):
+        return movetext
+
+    def _variations(self, start, end, variations):
+        return variations
+
+    def _game(self, elements):
+        tag_pairs, _, gcomment, movetext, score, _ = elements
+        return self._actions.build_game(tag_pairs, gcomment, movetext, score)
+
+
+class _Movetext(object):
+    """A movetext being read, and the move in it whose variations are being read"""
+    __slots__ = ('start', 'moves', 'move', 'elements', 'black', 'variations',
+                 'variations_start', 'opened')
+
+    def __init__(self, start):
+        self.start = start
+        self.moves = []
+        self.move = start
+        self.elements = None
+        self.black = False
+        self.variations = None
+        self.variations_start = start
+        self.opened = start
+
+
+def parse(input, actions=None, types=None, encoding='utf-8', fallback='latin-1'):
+    return FastParser(input, actions, types, encoding, fallback).parse()
+
+
+def parse_direct(input, actions=None, types=None, encoding='utf-8', fallback='latin-1'):
+    return DirectParser(input, actions, types, encoding, fallback).parse()
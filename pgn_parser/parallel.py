@@ -0,0 +1,130 @@
+"""Parsing the games of a large pgn file across several processes
+
+Parsing is pure Python and so bound to one core per process. The file is
+indexed once, cut into byte ranges that each hold whole games, and the ranges
+are parsed by a pool of worker processes.
+"""
+import os
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import pgn_parser.parser as parser
+import pgn_parser.stream as stream
+from pgn_parser.database import PGNDatabase
+from pgn_parser.pgn import Actions
+
+
+def parse_many(source, workers=None, ordered=True, reduce=None, actions=None,
+               encoding="utf-8", chunk_size=1 << 20, sidecar=False):
+    """Parses every game in a pgn file using a pool of processes
+
+    Only a couple of ranges per worker are in flight at once, so memory is
+    bounded however large the file is and however slowly results are used.
+
+    Args:
+        source: The path of the pgn file
+        workers: The number of processes, os.cpu_count() by default
+        ordered: Whether to yield games in file order, if not each range is
+            yielded as soon as it is parsed
+        reduce: A function applied to each Game in the worker, its result is
+            yielded instead of the Game. Must be picklable, so defined at the
+            top level of a module.
+        actions: The actions to parse with, a new Actions() by default
+        encoding: The encoding of the file
+        chunk_size: Roughly how many bytes of games each worker parses at once
+        sidecar: Passed to PGNDatabase to reuse a saved index of the file.
+            Compressed files cannot be indexed, they are read and cut into
+            games in this process and the games sent to the workers instead.
+
+    Yields:
+        Each Game, or the result of reduce(game)
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if actions is None:
+        actions = Actions()
+    with open(source, 'rb') as f:
+        compressed = stream.is_compressed(f.read(8))
+    if compressed:
+        # There are no offsets to hand out, so the games themselves are sent
+        tasks = ((_parse_texts, texts) for texts in _batches(source, chunk_size))
+    else:
+        with PGNDatabase(source, sidecar=sidecar) as db:
+            tasks = [(_parse_range, (source, start, end))
+                     for start, end in _ranges(db, chunk_size)]
+
+    pending = deque()
+    with ProcessPoolExecutor(workers) as pool:
+        try:
+            for fn, args in tasks:
+                pending.append(pool.submit(fn, args, encoding, actions, reduce))
+                if len(pending) < 2 * workers:
+                    continue
+                for result in _collect(pending, ordered):
+                    yield result
+            while pending:
+                for result in _collect(pending, ordered):
+                    yield result
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def _batches(source, chunk_size):
+    """Groups the games read from a file into lists of about chunk_size bytes"""
+    batch, size = [], 0
+    for offset, line, text in stream.read_games(source):
+        batch.append(text)
+        size += len(text)
+        if size >= chunk_size:
+            yield batch
+            batch, size = [], 0
+    if batch:
+        yield batch
+
+
+def _ranges(db, chunk_size):
+    """Cuts the indexed file into (start, end) byte ranges of whole games"""
+    out = []
+    i, n = 0, len(db)
+    while i < n:
+        start, _ = db.span(i)
+        i = max(db.find(start + chunk_size, i), i + 1)
+        if i < n:
+            end, _ = db.span(i)
+        else:
+            end = sum(db.span(n - 1))
+        out.append((start, end))
+    return out
+
+
+def _collect(pending, ordered):
+    """Waits for at least one range to be parsed, returning its results"""
+    if ordered:
+        return pending.popleft().result()
+    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+    out = []
+    for future in done:
+        pending.remove(future)
+        out.extend(future.result())
+    return out
+
+
+def _parse_range(args, encoding, actions, reduce):
+    """Parses the games between two offsets of a file, in a worker process"""
+    path, start, end = args
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    starts, ends = [], []
+    stream.scan_games(data, 0, True, starts, ends)
+    return _parse_texts([data[s:e] for s, e in zip(starts, ends)],
+                        encoding, actions, reduce)
+
+
+def _parse_texts(texts, encoding, actions, reduce):
+    """Parses a list of games, in a worker process"""
+    out = []
+    for text in texts:
+        game = parser.parse(text, actions=actions, encoding=encoding)
+        out.append(reduce(game) if reduce is not None else game)
+    return out
@@ -1,15 +1,40 @@
-# This file was generated from pgn_parser/parser.peg
-# See http://canopy.jcoglan.com/ for documentation.
+# This file was first generated from pgn_parser/parser.peg by canopy, see
+# http://canopy.jcoglan.com/ for documentation. It has since been changed by
+# hand (BytesInput, Memo, Parser, parse_batch and several _read_* rules), so it is
+# no longer regenerated. Changes to the grammar are made both in parser.peg
+# and here, `make canopy` generates a copy under build/ to compare against.
 
-from collections import defaultdict
 import re
+import sys
 
 
 class TreeNode(object):
-    def __init__(self, text, offset, elements=None):
-        self.text = text
+    __slots__ = ('_input', '_text', 'offset', 'end', 'elements')
+
+    # A node is a span of the input from offset to end, its text is only cut
+    # out of the input if asked for. Given a text and no end, the node holds
+    # that text instead.
+    def __init__(self, text, offset, elements=None, end=None):
+        if end is None:
+            self._input = None
+            self._text = text
+            end = offset + len(text)
+        else:
+            self._input = text
+            self._text = None
         self.offset = offset
-        self.elements = elements or []
+        self.end = end
+        self.elements = elements or ()
+
+    @property
+    def text(self):
+        if self._text is None:
+            self._text = self._input[self.offset:self.end]
+        return self._text
+
+    @text.setter
+    def text(self, text):
+        self._text = text
 
     def __iter__(self):
         for el in self.elements:
@@ -17,8 +42,10 @@ class TreeNode(object):
 
 
 class TreeNode1(TreeNode):
-    def __init__(self, text, offset, elements):
-        super(TreeNode1, self).__init__(text, offset, elements)
+    __slots__ = ('tag_pairs', 'gcomment', 'movetext', 'score')
+
+    def __init__(self, text, offset, elements, end=None):
+        super(TreeNode1, self).__init__(text, offset, elements, end)
         self.tag_pairs = elements[0]
         self.gcomment = elements[2]
         self.movetext = elements[3]
@@ -26,16 +53,21 @@ class TreeNode1(TreeNode):
 
 
 class TreeNode2(TreeNode):
-    def __init__(self, text, offset, elements):
-        super(TreeNode2, self).__init__(text, offset, elements)
+    __slots__ = ('dlm', 'key', 'value')
+
+    def __init__(self, text, offset, elements, end=None):
+        super(TreeNode2, self).__init__(text, offset, elements, end)
         self.dlm = elements[9]
         self.key = elements[2]
         self.value = elements[5]
 
 
 class TreeNode3(TreeNode):
-    def __init__(self, text, offset, elements):
-        super(TreeNode3, self).__init__(text, offset, elements)
+    __slots__ = ('move_number', 'dlm', 'white', 'san', 'wnags', 'wcomment', 'wvars',
+                 'black', 'bnags', 'bcomment', 'bvars', 'mcomment')
+
+    def __init__(self, text, offset, elements, end=None):
+        super(TreeNode3, self).__init__(text, offset, elements, end)
         self.move_number = elements[0]
         self.dlm = elements[15]
         self.white = elements[2]
@@ -51,65 +83,83 @@ class TreeNode3(TreeNode):
 
 
 class TreeNode4(TreeNode):
-    def __init__(self, text, offset, elements):
-        super(TreeNode4, self).__init__(text, offset, elements)
+    __slots__ = ('file', 'takes', 'square')
+
+    def __init__(self, text, offset, elements, end=None):
+        super(TreeNode4, self).__init__(text, offset, elements, end)
         self.file = elements[0]
         self.takes = elements[1]
         self.square = elements[2]
 
 
 class TreeNode5(TreeNode):
-    def __init__(self, text, offset, elements):
-        super(TreeNode5, self).__init__(text, offset, elements)
+    __slots__ = ('piece', 'square')
+
+    def __init__(self, text, offset, elements, end=None):
+        super(TreeNode5, self).__init__(text, offset, elements, end)
         self.piece = elements[0]
         self.square = elements[3]
 
 
 class TreeNode6(TreeNode):
-    def __init__(self, text, offset, elements):
-        super(TreeNode6, self).__init__(text, offset, elements)
+    __slots__ = ('piece', 'square')
+
+    def __init__(self, text, offset, elements, end=None):
+        super(TreeNode6, self).__init__(text, offset, elements, end)
         self.piece = elements[0]
         self.square = elements[2]
 
 
 class TreeNode7(TreeNode):
-    def __init__(self, text, offset, elements):
-        super(TreeNode7, self).__init__(text, offset, elements)
+    __slots__ = ('piece', 'file', 'square')
+
+    def __init__(self, text, offset, elements, end=None):
+        super(TreeNode7, self).__init__(text, offset, elements, end)
         self.piece = elements[0]
         self.file = elements[1]
         self.square = elements[3]
 
 
 class TreeNode8(TreeNode):
-    def __init__(self, text, offset, elements):
-        super(TreeNode8, self).__init__(text, offset, elements)
+    __slots__ = ('piece', 'rank', 'square')
+
+    def __init__(self, text, offset, elements, end=None):
+        super(TreeNode8, self).__init__(text, offset, elements, end)
         self.piece = elements[0]
         self.rank = elements[1]
         self.square = elements[3]
 
 
 class TreeNode9(TreeNode):
-    def __init__(self, text, offset, elements):
-        super(TreeNode9, self).__init__(text, offset, elements)
+    __slots__ = ('file', 'rank')
+
+    def __init__(self, text, offset, elements, end=None):
+        super(TreeNode9, self).__init__(text, offset, elements, end)
         self.file = elements[0]
         self.rank = elements[1]
 
 
 class TreeNode10(TreeNode):
-    def __init__(self, text, offset, elements):
-        super(TreeNode10, self).__init__(text, offset, elements)
+    __slots__ = ('dlm',)
+
+    def __init__(self, text, offset, elements, end=None):
+        super(TreeNode10, self).__init__(text, offset, elements, end)
         self.dlm = elements[3]
 
 
 class TreeNode11(TreeNode):
-    def __init__(self, text, offset, elements):
-        super(TreeNode11, self).__init__(text, offset, elements)
+    __slots__ = ('dlm',)
+
+    def __init__(self, text, offset, elements, end=None):
+        super(TreeNode11, self).__init__(text, offset, elements, end)
         self.dlm = elements[2]
 
 
 class TreeNode12(TreeNode):
-    def __init__(self, text, offset, elements):
-        super(TreeNode12, self).__init__(text, offset, elements)
+    __slots__ = ('dlm', 'movetext')
+
+    def __init__(self, text, offset, elements, end=None):
+        super(TreeNode12, self).__init__(text, offset, elements, end)
         self.dlm = elements[4]
         self.movetext = elements[2]
 
@@ -123,18 +173,11 @@ FAILURE = object()
 
 class Grammar(object):
     REGEX_1 = re.compile('^[\\n]')
-    REGEX_2 = re.compile('^[\\s]')
-    REGEX_3 = re.compile('^[A-Za-z0-9_]')
-    REGEX_4 = re.compile('^[^\\"]')
-    REGEX_5 = re.compile('^[0-9]')
     REGEX_6 = re.compile('^[KQRNBP]')
     REGEX_7 = re.compile('^[a-h]')
     REGEX_8 = re.compile('^[1-8]')
     REGEX_9 = re.compile('^[KQRNB]')
     REGEX_10 = re.compile('^[+#]')
-    REGEX_11 = re.compile('^[^\\}]')
-    REGEX_12 = re.compile('^[0-9]')
-    REGEX_13 = re.compile('^[\\s]')
 
     def _read_game(self):
         address0, index0 = FAILURE, self._offset
@@ -153,7 +196,7 @@ class Grammar(object):
             if self._offset < self._input_size:
                 chunk0 = self._input[self._offset:self._offset + 1]
             if chunk0 is not None and Grammar.REGEX_1.search(chunk0):
-                address2 = TreeNode(self._input[self._offset:self._offset + 1], self._offset)
+                address2 = TreeNode(self._input, self._offset, None, self._offset + 1)
                 self._offset = self._offset + 1
             else:
                 address2 = FAILURE
@@ -163,7 +206,7 @@ class Grammar(object):
                 if self._offset == self._failure:
                     self._expected.append('[\\n]')
             if address2 is FAILURE:
-                address2 = TreeNode(self._input[index2:index2], index2)
+                address2 = TreeNode(self._input, index2, None, index2)
                 self._offset = index2
             if address2 is not FAILURE:
                 elements0.append(address2)
@@ -171,7 +214,7 @@ class Grammar(object):
                 index3 = self._offset
                 address3 = self._read_comment()
                 if address3 is FAILURE:
-                    address3 = TreeNode(self._input[index3:index3], index3)
+                    address3 = TreeNode(self._input, index3, None, index3)
                     self._offset = index3
                 if address3 is not FAILURE:
                     elements0.append(address3)
@@ -183,34 +226,12 @@ class Grammar(object):
                         index4 = self._offset
                         address5 = self._read_score()
                         if address5 is FAILURE:
-                            address5 = TreeNode(self._input[index4:index4], index4)
+                            address5 = TreeNode(self._input, index4, None, index4)
                             self._offset = index4
                         if address5 is not FAILURE:
                             elements0.append(address5)
                             address6 = FAILURE
-                            remaining0, index5, elements1, address7 = 0, self._offset, [], True
-                            while address7 is not FAILURE:
-                                chunk1 = None
-                                if self._offset < self._input_size:
-                                    chunk1 = self._input[self._offset:self._offset + 1]
-                                if chunk1 is not None and Grammar.REGEX_2.search(chunk1):
-                                    address7 = TreeNode(self._input[self._offset:self._offset + 1], self._offset)
-                                    self._offset = self._offset + 1
-                                else:
-                                    address7 = FAILURE
-                                    if self._offset > self._failure:
-                                        self._failure = self._offset
-                                        self._expected = []
-                                    if self._offset == self._failure:
-                                        self._expected.append('[\\s]')
-                                if address7 is not FAILURE:
-                                    elements1.append(address7)
-                                    remaining0 -= 1
-                            if remaining0 <= 0:
-                                address6 = TreeNode(self._input[index5:self._offset], index5, elements1)
-                                self._offset = self._offset
-                            else:
-                                address6 = FAILURE
+                            address6 = self._read_run('[\\s]', 0)
                             if address6 is not FAILURE:
                                 elements0.append(address6)
                             else:
@@ -271,7 +292,7 @@ class Grammar(object):
         if self._offset < self._input_size:
             chunk0 = self._input[self._offset:self._offset + 1]
         if chunk0 == '[':
-            address1 = TreeNode(self._input[self._offset:self._offset + 1], self._offset)
+            address1 = TreeNode(self._input, self._offset, None, self._offset + 1)
             self._offset = self._offset + 1
         else:
             address1 = FAILURE
@@ -299,7 +320,7 @@ class Grammar(object):
                         if self._offset < self._input_size:
                             chunk1 = self._input[self._offset:self._offset + 1]
                         if chunk1 == '"':
-                            address5 = TreeNode(self._input[self._offset:self._offset + 1], self._offset)
+                            address5 = TreeNode(self._input, self._offset, None, self._offset + 1)
                             self._offset = self._offset + 1
                         else:
                             address5 = FAILURE
@@ -319,7 +340,7 @@ class Grammar(object):
                                 if self._offset < self._input_size:
                                     chunk2 = self._input[self._offset:self._offset + 1]
                                 if chunk2 == '"':
-                                    address7 = TreeNode(self._input[self._offset:self._offset + 1], self._offset)
+                                    address7 = TreeNode(self._input, self._offset, None, self._offset + 1)
                                     self._offset = self._offset + 1
                                 else:
                                     address7 = FAILURE
@@ -339,7 +360,7 @@ class Grammar(object):
                                         if self._offset < self._input_size:
                                             chunk3 = self._input[self._offset:self._offset + 1]
                                         if chunk3 == ']':
-                                            address9 = TreeNode(self._input[self._offset:self._offset + 1], self._offset)
+                                            address9 = TreeNode(self._input, self._offset, None, self._offset + 1)
                                             self._offset = self._offset + 1
                                         else:
                                             address9 = FAILURE
@@ -398,29 +419,7 @@ class Grammar(object):
         if cached:
             self._offset = cached[1]
             return cached[0]
-        remaining0, index1, elements0, address1 = 1, self._offset, [], True
-        while address1 is not FAILURE:
-            chunk0 = None
-            if self._offset < self._input_size:
-                chunk0 = self._input[self._offset:self._offset + 1]
-            if chunk0 is not None and Grammar.REGEX_3.search(chunk0):
-                address1 = TreeNode(self._input[self._offset:self._offset + 1], self._offset)
-                self._offset = self._offset + 1
-            else:
-                address1 = FAILURE
-                if self._offset > self._failure:
-                    self._failure = self._offset
-                    self._expected = []
-                if self._offset == self._failure:
-                    self._expected.append('[A-Za-z0-9_]')
-            if address1 is not FAILURE:
-                elements0.append(address1)
-                remaining0 -= 1
-        if remaining0 <= 0:
-            address0 = TreeNode(self._input[index1:self._offset], index1, elements0)
-            self._offset = self._offset
-        else:
-            address0 = FAILURE
+        address0 = self._read_run('[A-Za-z0-9_]', 1)
         self._cache['key'][index0] = (address0, self._offset)
         return address0
 
@@ -430,29 +429,7 @@ class Grammar(object):
         if cached:
             self._offset = cached[1]
             return cached[0]
-        remaining0, index1, elements0, address1 = 0, self._offset, [], True
-        while address1 is not FAILURE:
-            chunk0 = None
-            if self._offset < self._input_size:
-                chunk0 = self._input[self._offset:self._offset + 1]
-            if chunk0 is not None and Grammar.REGEX_4.search(chunk0):
-                address1 = TreeNode(self._input[self._offset:self._offset + 1], self._offset)
-                self._offset = self._offset + 1
-            else:
-                address1 = FAILURE
-                if self._offset > self._failure:
-                    self._failure = self._offset
-                    self._expected = []
-                if self._offset == self._failure:
-                    self._expected.append('[^\\"]')
-            if address1 is not FAILURE:
-                elements0.append(address1)
-                remaining0 -= 1
-        if remaining0 <= 0:
-            address0 = TreeNode(self._input[index1:self._offset], index1, elements0)
-            self._offset = self._offset
-        else:
-            address0 = FAILURE
+        address0 = self._read_run('[^\\"]', 0)
         self._cache['value'][index0] = (address0, self._offset)
         return address0
 
@@ -503,7 +480,7 @@ class Grammar(object):
                         index2 = self._offset
                         address5 = self._read_nags()
                         if address5 is FAILURE:
-                            address5 = TreeNode(self._input[index2:index2], index2)
+                            address5 = TreeNode(self._input, index2, None, index2)
                             self._offset = index2
                         if address5 is not FAILURE:
                             elements0.append(address5)
@@ -515,7 +492,7 @@ class Grammar(object):
                                 index3 = self._offset
                                 address7 = self._read_comment()
                                 if address7 is FAILURE:
-                                    address7 = TreeNode(self._input[index3:index3], index3)
+                                    address7 = TreeNode(self._input, index3, None, index3)
                                     self._offset = index3
                                 if address7 is not FAILURE:
                                     elements0.append(address7)
@@ -523,7 +500,7 @@ class Grammar(object):
                                     index4 = self._offset
                                     address8 = self._read_variations()
                                     if address8 is FAILURE:
-                                        address8 = TreeNode(self._input[index4:index4], index4)
+                                        address8 = TreeNode(self._input, index4, None, index4)
                                         self._offset = index4
                                     if address8 is not FAILURE:
                                         elements0.append(address8)
@@ -535,7 +512,7 @@ class Grammar(object):
                                             index5 = self._offset
                                             address10 = self._read_san()
                                             if address10 is FAILURE:
-                                                address10 = TreeNode(self._input[index5:index5], index5)
+                                                address10 = TreeNode(self._input, index5, None, index5)
                                                 self._offset = index5
                                             if address10 is not FAILURE:
                                                 elements0.append(address10)
@@ -547,7 +524,7 @@ class Grammar(object):
                                                     index6 = self._offset
                                                     address12 = self._read_nags()
                                                     if address12 is FAILURE:
-                                                        address12 = TreeNode(self._input[index6:index6], index6)
+                                                        address12 = TreeNode(self._input, index6, None, index6)
                                                         self._offset = index6
                                                     if address12 is not FAILURE:
                                                         elements0.append(address12)
@@ -559,7 +536,7 @@ class Grammar(object):
                                                             index7 = self._offset
                                                             address14 = self._read_comment()
                                                             if address14 is FAILURE:
-                                                                address14 = TreeNode(self._input[index7:index7], index7)
+                                                                address14 = TreeNode(self._input, index7, None, index7)
                                                                 self._offset = index7
                                                             if address14 is not FAILURE:
                                                                 elements0.append(address14)
@@ -567,7 +544,7 @@ class Grammar(object):
                                                                 index8 = self._offset
                                                                 address15 = self._read_variations()
                                                                 if address15 is FAILURE:
-                                                                    address15 = TreeNode(self._input[index8:index8], index8)
+                                                                    address15 = TreeNode(self._input, index8, None, index8)
                                                                     self._offset = index8
                                                                 if address15 is not FAILURE:
                                                                     elements0.append(address15)
@@ -579,7 +556,7 @@ class Grammar(object):
                                                                         index9 = self._offset
                                                                         address17 = self._read_comment()
                                                                         if address17 is FAILURE:
-                                                                            address17 = TreeNode(self._input[index9:index9], index9)
+                                                                            address17 = TreeNode(self._input, index9, None, index9)
                                                                             self._offset = index9
                                                                         if address17 is not FAILURE:
                                                                             elements0.append(address17)
@@ -637,7 +614,7 @@ class Grammar(object):
         if elements0 is None:
             address0 = FAILURE
         else:
-            address0 = TreeNode3(self._input[index1:self._offset], index1, elements0)
+            address0 = TreeNode3(self._input, index1, elements0, self._offset)
             self._offset = self._offset
         self._cache['move'][index0] = (address0, self._offset)
         return address0
@@ -650,29 +627,7 @@ class Grammar(object):
             return cached[0]
         index1, elements0 = self._offset, []
         address1 = FAILURE
-        remaining0, index2, elements1, address2 = 1, self._offset, [], True
-        while address2 is not FAILURE:
-            chunk0 = None
-            if self._offset < self._input_size:
-                chunk0 = self._input[self._offset:self._offset + 1]
-            if chunk0 is not None and Grammar.REGEX_5.search(chunk0):
-                address2 = TreeNode(self._input[self._offset:self._offset + 1], self._offset)
-                self._offset = self._offset + 1
-            else:
-                address2 = FAILURE
-                if self._offset > self._failure:
-                    self._failure = self._offset
-                    self._expected = []
-                if self._offset == self._failure:
-                    self._expected.append('[0-9]')
-            if address2 is not FAILURE:
-                elements1.append(address2)
-                remaining0 -= 1
-        if remaining0 <= 0:
-            address1 = TreeNode(self._input[index2:self._offset], index2, elements1)
-            self._offset = self._offset
-        else:
-            address1 = FAILURE
+        address1 = self._read_run('[0-9]', 1)
         if address1 is not FAILURE:
             elements0.append(address1)
             address3 = FAILURE
@@ -680,7 +635,7 @@ class Grammar(object):
             if self._offset < self._input_size:
                 chunk1 = self._input[self._offset:self._offset + 1]
             if chunk1 == '.':
-                address3 = TreeNode(self._input[self._offset:self._offset + 1], self._offset)
+                address3 = TreeNode(self._input, self._offset, None, self._offset + 1)
                 self._offset = self._offset + 1
             else:
                 address3 = FAILURE
@@ -700,7 +655,7 @@ class Grammar(object):
         if elements0 is None:
             address0 = FAILURE
         else:
-            address0 = TreeNode(self._input[index1:self._offset], index1, elements0)
+            address0 = TreeNode(self._input, index1, elements0, self._offset)
             self._offset = self._offset
         self._cache['move_number'][index0] = (address0, self._offset)
         return address0
@@ -745,7 +700,7 @@ class Grammar(object):
                 if elements1 is None:
                     address1 = FAILURE
                 else:
-                    address1 = TreeNode4(self._input[index3:self._offset], index3, elements1)
+                    address1 = TreeNode4(self._input, index3, elements1, self._offset)
                     self._offset = self._offset
                 if address1 is FAILURE:
                     self._offset = index2
@@ -761,7 +716,7 @@ class Grammar(object):
             index4 = self._offset
             address5 = self._read_promotes()
             if address5 is FAILURE:
-                address5 = TreeNode(self._input[index4:index4], index4)
+                address5 = TreeNode(self._input, index4, None, index4)
                 self._offset = index4
             if address5 is not FAILURE:
                 elements0.append(address5)
@@ -769,7 +724,7 @@ class Grammar(object):
                 index5 = self._offset
                 address6 = self._read_check()
                 if address6 is FAILURE:
-                    address6 = TreeNode(self._input[index5:index5], index5)
+                    address6 = TreeNode(self._input, index5, None, index5)
                     self._offset = index5
                 if address6 is not FAILURE:
                     elements0.append(address6)
@@ -785,7 +740,7 @@ class Grammar(object):
         if elements0 is None:
             address0 = FAILURE
         else:
-            address0 = TreeNode(self._input[index1:self._offset], index1, elements0)
+            address0 = TreeNode(self._input, index1, elements0, self._offset)
             self._offset = self._offset
         self._cache['san'][index0] = (address0, self._offset)
         return address0
@@ -810,7 +765,7 @@ class Grammar(object):
                 index3 = self._offset
                 address3 = self._read_takes()
                 if address3 is FAILURE:
-                    address3 = TreeNode(self._input[index3:index3], index3)
+                    address3 = TreeNode(self._input, index3, None, index3)
                     self._offset = index3
                 if address3 is not FAILURE:
                     elements0.append(address3)
@@ -833,7 +788,7 @@ class Grammar(object):
         if elements0 is None:
             address0 = FAILURE
         else:
-            address0 = TreeNode5(self._input[index2:self._offset], index2, elements0)
+            address0 = TreeNode5(self._input, index2, elements0, self._offset)
             self._offset = self._offset
         if address0 is FAILURE:
             self._offset = index1
@@ -846,7 +801,7 @@ class Grammar(object):
                 index5 = self._offset
                 address6 = self._read_takes()
                 if address6 is FAILURE:
-                    address6 = TreeNode(self._input[index5:index5], index5)
+                    address6 = TreeNode(self._input, index5, None, index5)
                     self._offset = index5
                 if address6 is not FAILURE:
                     elements1.append(address6)
@@ -866,7 +821,7 @@ class Grammar(object):
             if elements1 is None:
                 address0 = FAILURE
             else:
-                address0 = TreeNode6(self._input[index4:self._offset], index4, elements1)
+                address0 = TreeNode6(self._input, index4, elements1, self._offset)
                 self._offset = self._offset
             if address0 is FAILURE:
                 self._offset = index1
@@ -883,7 +838,7 @@ class Grammar(object):
                         index7 = self._offset
                         address10 = self._read_takes()
                         if address10 is FAILURE:
-                            address10 = TreeNode(self._input[index7:index7], index7)
+                            address10 = TreeNode(self._input, index7, None, index7)
                             self._offset = index7
                         if address10 is not FAILURE:
                             elements2.append(address10)
@@ -906,7 +861,7 @@ class Grammar(object):
                 if elements2 is None:
                     address0 = FAILURE
                 else:
-                    address0 = TreeNode7(self._input[index6:self._offset], index6, elements2)
+                    address0 = TreeNode7(self._input, index6, elements2, self._offset)
                     self._offset = self._offset
                 if address0 is FAILURE:
                     self._offset = index1
@@ -923,7 +878,7 @@ class Grammar(object):
                             index9 = self._offset
                             address14 = self._read_takes()
                             if address14 is FAILURE:
-                                address14 = TreeNode(self._input[index9:index9], index9)
+                                address14 = TreeNode(self._input, index9, None, index9)
                                 self._offset = index9
                             if address14 is not FAILURE:
                                 elements3.append(address14)
@@ -946,7 +901,7 @@ class Grammar(object):
                     if elements3 is None:
                         address0 = FAILURE
                     else:
-                        address0 = TreeNode8(self._input[index8:self._offset], index8, elements3)
+                        address0 = TreeNode8(self._input, index8, elements3, self._offset)
                         self._offset = self._offset
                     if address0 is FAILURE:
                         self._offset = index1
@@ -963,7 +918,7 @@ class Grammar(object):
         if self._offset < self._input_size:
             chunk0 = self._input[self._offset:self._offset + 1]
         if chunk0 is not None and Grammar.REGEX_6.search(chunk0):
-            address0 = TreeNode(self._input[self._offset:self._offset + 1], self._offset)
+            address0 = TreeNode(self._input, self._offset, None, self._offset + 1)
             self._offset = self._offset + 1
         else:
             address0 = FAILURE
@@ -1004,7 +959,7 @@ class Grammar(object):
         if self._offset < self._input_size:
             chunk0 = self._input[self._offset:self._offset + 1]
         if chunk0 == 'x':
-            address0 = TreeNode(self._input[self._offset:self._offset + 1], self._offset)
+            address0 = TreeNode(self._input, self._offset, None, self._offset + 1)
             self._offset = self._offset + 1
         else:
             address0 = FAILURE
@@ -1040,7 +995,7 @@ class Grammar(object):
         if elements0 is None:
             address0 = FAILURE
         else:
-            address0 = TreeNode9(self._input[index1:self._offset], index1, elements0)
+            address0 = TreeNode9(self._input, index1, elements0, self._offset)
             self._offset = self._offset
         self._cache['square'][index0] = (address0, self._offset)
         return address0
@@ -1055,7 +1010,7 @@ class Grammar(object):
         if self._offset < self._input_size:
             chunk0 = self._input[self._offset:self._offset + 1]
         if chunk0 is not None and Grammar.REGEX_7.search(chunk0):
-            address0 = TreeNode(self._input[self._offset:self._offset + 1], self._offset)
+            address0 = TreeNode(self._input, self._offset, None, self._offset + 1)
             self._offset = self._offset + 1
         else:
             address0 = FAILURE
@@ -1077,7 +1032,7 @@ class Grammar(object):
         if self._offset < self._input_size:
             chunk0 = self._input[self._offset:self._offset + 1]
         if chunk0 is not None and Grammar.REGEX_8.search(chunk0):
-            address0 = TreeNode(self._input[self._offset:self._offset + 1], self._offset)
+            address0 = TreeNode(self._input, self._offset, None, self._offset + 1)
             self._offset = self._offset + 1
         else:
             address0 = FAILURE
@@ -1101,7 +1056,7 @@ class Grammar(object):
         if self._offset < self._input_size:
             chunk0 = self._input[self._offset:self._offset + 1]
         if chunk0 == '=':
-            address1 = TreeNode(self._input[self._offset:self._offset + 1], self._offset)
+            address1 = TreeNode(self._input, self._offset, None, self._offset + 1)
             self._offset = self._offset + 1
         else:
             address1 = FAILURE
@@ -1117,7 +1072,7 @@ class Grammar(object):
             if self._offset < self._input_size:
                 chunk1 = self._input[self._offset:self._offset + 1]
             if chunk1 is not None and Grammar.REGEX_9.search(chunk1):
-                address2 = TreeNode(self._input[self._offset:self._offset + 1], self._offset)
+                address2 = TreeNode(self._input, self._offset, None, self._offset + 1)
                 self._offset = self._offset + 1
             else:
                 address2 = FAILURE
@@ -1137,7 +1092,7 @@ class Grammar(object):
         if elements0 is None:
             address0 = FAILURE
         else:
-            address0 = TreeNode(self._input[index1:self._offset], index1, elements0)
+            address0 = TreeNode(self._input, index1, elements0, self._offset)
             self._offset = self._offset
         self._cache['promotes'][index0] = (address0, self._offset)
         return address0
@@ -1152,7 +1107,7 @@ class Grammar(object):
         if self._offset < self._input_size:
             chunk0 = self._input[self._offset:self._offset + 1]
         if chunk0 is not None and Grammar.REGEX_10.search(chunk0):
-            address0 = TreeNode(self._input[self._offset:self._offset + 1], self._offset)
+            address0 = TreeNode(self._input, self._offset, None, self._offset + 1)
             self._offset = self._offset + 1
         else:
             address0 = FAILURE
@@ -1175,7 +1130,7 @@ class Grammar(object):
         if self._offset < self._input_size:
             chunk0 = self._input[self._offset:self._offset + 5]
         if chunk0 == 'O-O-O':
-            address0 = TreeNode(self._input[self._offset:self._offset + 5], self._offset)
+            address0 = TreeNode(self._input, self._offset, None, self._offset + 5)
             self._offset = self._offset + 5
         else:
             address0 = FAILURE
@@ -1190,7 +1145,7 @@ class Grammar(object):
             if self._offset < self._input_size:
                 chunk1 = self._input[self._offset:self._offset + 3]
             if chunk1 == 'O-O':
-                address0 = TreeNode(self._input[self._offset:self._offset + 3], self._offset)
+                address0 = TreeNode(self._input, self._offset, None, self._offset + 3)
                 self._offset = self._offset + 3
             else:
                 address0 = FAILURE
@@ -1216,7 +1171,7 @@ class Grammar(object):
         if self._offset < self._input_size:
             chunk0 = self._input[self._offset:self._offset + 1]
         if chunk0 == '{':
-            address1 = TreeNode(self._input[self._offset:self._offset + 1], self._offset)
+            address1 = TreeNode(self._input, self._offset, None, self._offset + 1)
             self._offset = self._offset + 1
         else:
             address1 = FAILURE
@@ -1228,29 +1183,7 @@ class Grammar(object):
         if address1 is not FAILURE:
             elements0.append(address1)
             address2 = FAILURE
-            remaining0, index2, elements1, address3 = 0, self._offset, [], True
-            while address3 is not FAILURE:
-                chunk1 = None
-                if self._offset < self._input_size:
-                    chunk1 = self._input[self._offset:self._offset + 1]
-                if chunk1 is not None and Grammar.REGEX_11.search(chunk1):
-                    address3 = TreeNode(self._input[self._offset:self._offset + 1], self._offset)
-                    self._offset = self._offset + 1
-                else:
-                    address3 = FAILURE
-                    if self._offset > self._failure:
-                        self._failure = self._offset
-                        self._expected = []
-                    if self._offset == self._failure:
-                        self._expected.append('[^\\}]')
-                if address3 is not FAILURE:
-                    elements1.append(address3)
-                    remaining0 -= 1
-            if remaining0 <= 0:
-                address2 = TreeNode(self._input[index2:self._offset], index2, elements1)
-                self._offset = self._offset
-            else:
-                address2 = FAILURE
+            address2 = self._read_run('[^\\}]', 0)
             if address2 is not FAILURE:
                 elements0.append(address2)
                 address4 = FAILURE
@@ -1258,7 +1191,7 @@ class Grammar(object):
                 if self._offset < self._input_size:
                     chunk2 = self._input[self._offset:self._offset + 1]
                 if chunk2 == '}':
-                    address4 = TreeNode(self._input[self._offset:self._offset + 1], self._offset)
+                    address4 = TreeNode(self._input, self._offset, None, self._offset + 1)
                     self._offset = self._offset + 1
                 else:
                     address4 = FAILURE
@@ -1303,7 +1236,7 @@ class Grammar(object):
         if self._offset < self._input_size:
             chunk0 = self._input[self._offset:self._offset + 2]
         if chunk0 == '..':
-            address0 = TreeNode(self._input[self._offset:self._offset + 2], self._offset)
+            address0 = TreeNode(self._input, self._offset, None, self._offset + 2)
             self._offset = self._offset + 2
         else:
             address0 = FAILURE
@@ -1328,7 +1261,7 @@ class Grammar(object):
                 elements0.append(address1)
                 remaining0 -= 1
         if remaining0 <= 0:
-            address0 = TreeNode(self._input[index1:self._offset], index1, elements0)
+            address0 = TreeNode(self._input, index1, elements0, self._offset)
             self._offset = self._offset
         else:
             address0 = FAILURE
@@ -1347,7 +1280,7 @@ class Grammar(object):
         if self._offset < self._input_size:
             chunk0 = self._input[self._offset:self._offset + 1]
         if chunk0 == '$':
-            address1 = TreeNode(self._input[self._offset:self._offset + 1], self._offset)
+            address1 = TreeNode(self._input, self._offset, None, self._offset + 1)
             self._offset = self._offset + 1
         else:
             address1 = FAILURE
@@ -1359,29 +1292,7 @@ class Grammar(object):
         if address1 is not FAILURE:
             elements0.append(address1)
             address2 = FAILURE
-            remaining0, index2, elements1, address3 = 1, self._offset, [], True
-            while address3 is not FAILURE:
-                chunk1 = None
-                if self._offset < self._input_size:
-                    chunk1 = self._input[self._offset:self._offset + 1]
-                if chunk1 is not None and Grammar.REGEX_12.search(chunk1):
-                    address3 = TreeNode(self._input[self._offset:self._offset + 1], self._offset)
-                    self._offset = self._offset + 1
-                else:
-                    address3 = FAILURE
-                    if self._offset > self._failure:
-                        self._failure = self._offset
-                        self._expected = []
-                    if self._offset == self._failure:
-                        self._expected.append('[0-9]')
-                if address3 is not FAILURE:
-                    elements1.append(address3)
-                    remaining0 -= 1
-            if remaining0 <= 0:
-                address2 = TreeNode(self._input[index2:self._offset], index2, elements1)
-                self._offset = self._offset
-            else:
-                address2 = FAILURE
+            address2 = self._read_run('[0-9]', 1)
             if address2 is not FAILURE:
                 elements0.append(address2)
                 address4 = FAILURE
@@ -1400,7 +1311,7 @@ class Grammar(object):
         if elements0 is None:
             address0 = FAILURE
         else:
-            address0 = TreeNode11(self._input[index1:self._offset], index1, elements0)
+            address0 = TreeNode11(self._input, index1, elements0, self._offset)
             self._offset = self._offset
         self._cache['nag'][index0] = (address0, self._offset)
         return address0
@@ -1437,7 +1348,7 @@ class Grammar(object):
         if self._offset < self._input_size:
             chunk0 = self._input[self._offset:self._offset + 1]
         if chunk0 == '(':
-            address1 = TreeNode(self._input[self._offset:self._offset + 1], self._offset)
+            address1 = TreeNode(self._input, self._offset, None, self._offset + 1)
             self._offset = self._offset + 1
         else:
             address1 = FAILURE
@@ -1461,7 +1372,7 @@ class Grammar(object):
                     if self._offset < self._input_size:
                         chunk1 = self._input[self._offset:self._offset + 1]
                     if chunk1 == ')':
-                        address4 = TreeNode(self._input[self._offset:self._offset + 1], self._offset)
+                        address4 = TreeNode(self._input, self._offset, None, self._offset + 1)
                         self._offset = self._offset + 1
                     else:
                         address4 = FAILURE
@@ -1510,7 +1421,7 @@ class Grammar(object):
         if self._offset < self._input_size:
             chunk0 = self._input[self._offset:self._offset + 3]
         if chunk0 == '1-0':
-            address0 = TreeNode(self._input[self._offset:self._offset + 3], self._offset)
+            address0 = TreeNode(self._input, self._offset, None, self._offset + 3)
             self._offset = self._offset + 3
         else:
             address0 = FAILURE
@@ -1525,7 +1436,7 @@ class Grammar(object):
             if self._offset < self._input_size:
                 chunk1 = self._input[self._offset:self._offset + 3]
             if chunk1 == '0-1':
-                address0 = TreeNode(self._input[self._offset:self._offset + 3], self._offset)
+                address0 = TreeNode(self._input, self._offset, None, self._offset + 3)
                 self._offset = self._offset + 3
             else:
                 address0 = FAILURE
@@ -1540,7 +1451,7 @@ class Grammar(object):
                 if self._offset < self._input_size:
                     chunk2 = self._input[self._offset:self._offset + 7]
                 if chunk2 == '1/2-1/2':
-                    address0 = TreeNode(self._input[self._offset:self._offset + 7], self._offset)
+                    address0 = TreeNode(self._input, self._offset, None, self._offset + 7)
                     self._offset = self._offset + 7
                 else:
                     address0 = FAILURE
@@ -1555,7 +1466,7 @@ class Grammar(object):
                     if self._offset < self._input_size:
                         chunk3 = self._input[self._offset:self._offset + 1]
                     if chunk3 == '*':
-                        address0 = TreeNode(self._input[self._offset:self._offset + 1], self._offset)
+                        address0 = TreeNode(self._input, self._offset, None, self._offset + 1)
                         self._offset = self._offset + 1
                     else:
                         address0 = FAILURE
@@ -1576,11 +1487,10 @@ class Grammar(object):
             self._offset = cached[1]
             return cached[0]
         index1 = self._offset
-        chunk0 = None
-        if self._offset < self._input_size:
-            chunk0 = self._input[self._offset:self._offset + 1]
-        if chunk0 is not None and Grammar.REGEX_13.search(chunk0):
-            address0 = TreeNode(self._input[self._offset:self._offset + 1], self._offset)
+        # Matched against the raw input, so bytes input has the same
+        # whitespace as in the runs, whatever a lone byte decodes to
+        if self._space.match(self._data, self._offset):
+            address0 = TreeNode(self._input, self._offset, None, self._offset + 1)
             self._offset = self._offset + 1
         else:
             address0 = FAILURE
@@ -1590,44 +1500,278 @@ class Grammar(object):
             if self._offset == self._failure:
                 self._expected.append('[\\s]')
         if address0 is FAILURE:
-            address0 = TreeNode(self._input[index1:index1], index1)
+            address0 = TreeNode(self._input, index1, None, index1)
             self._offset = index1
         self._cache['dlm'][index0] = (address0, self._offset)
         return address0
 
 
+class BytesInput(object):
+    # Single bytes are what the grammar matches against one at a time, ASCII
+    # ones are looked up rather than decoded
+    CHARS = [chr(b) for b in range(128)]
+
+    def __init__(self, data, encoding='utf-8', fallback='latin-1'):
+        self._data = data
+        self._encoding = encoding
+        self._fallback = fallback
+
+    def __len__(self):
+        return len(self._data)
+
+    def __getitem__(self, key):
+        chunk = self._data[key]
+        if len(chunk) == 1 and chunk[0] < 0x80:
+            return BytesInput.CHARS[chunk[0]]
+        try:
+            return str(chunk, self._encoding)
+        except UnicodeDecodeError:
+            return str(chunk, self._fallback)
+
+    # The searches are only used to show where a parse failed
+    def find(self, sub, start=0, end=None):
+        return self._bytes().find(sub.encode('ascii'), start, end)
+
+    def rfind(self, sub, start=0, end=None):
+        return self._bytes().rfind(sub.encode('ascii'), start, end)
+
+    def count(self, sub, start=0, end=None):
+        return self._bytes().count(sub.encode('ascii'), start, end)
+
+    def _bytes(self):
+        return self._data if isinstance(self._data, bytes) else bytes(self._data)
+
+
+# The rules worth memoizing, those that are re-read at the same offset when an
+# optional part of a move fails and that are slower to match than to look up
+MEMO_RULES = frozenset(['comment', 'nags', 'variation', 'variations'])
+
+
+class _NoMemo(object):
+    # Stands in for the table of a rule that is not memoized
+    def get(self, offset):
+        return None
+
+    def __setitem__(self, offset, value):
+        pass
+
+
+_NO_MEMO = _NoMemo()
+
+
+class Memo(dict):
+    # The packrat cache, a table of offset -> (tree, end) for each rule that
+    # is memoized. With window set, entries behind the start of the top level
+    # move being parsed are dropped, as they can never be read again.
+    def __init__(self, rules=MEMO_RULES, window=False):
+        dict.__init__(self)
+        self.rules = rules
+        self.window = window
+        self._tables = []
+
+    def __missing__(self, rule):
+        if self.rules is None or rule in self.rules:
+            table = {}
+            self._tables.append(table)
+        else:
+            table = _NO_MEMO
+        self[rule] = table
+        return table
+
+    def empty(self):
+        # Empties the tables but keeps them, and which rules they belong to
+        for table in self._tables:
+            table.clear()
+
+    def commit(self, offset):
+        for table in self._tables:
+            stale = []
+            # Tables fill in roughly increasing offset order
+            for key in table:
+                if key >= offset:
+                    break
+                stale.append(key)
+            for key in stale:
+                del table[key]
+
+    def size(self):
+        return sum(len(table) for table in self._tables)
+
+
+# The character classes matched as a run in one step, against str input and
+# against bytes as BytesInput presents them, where only ASCII can be whitespace
+RUN_CLASSES = ['[\\s]', '[A-Za-z0-9_]', '[^\\"]', '[0-9]', '[^\\}]']
+_ASCII_SPACE = r'\t\n\x0b\x0c\r\x1c-\x1f '
+_STR_RUNS = dict((c, re.compile(c + '*')) for c in RUN_CLASSES)
+_BYTES_RUNS = dict((c, re.compile((c.replace('\\s', _ASCII_SPACE) + '*').encode('ascii')))
+                   for c in RUN_CLASSES)
+_STR_SPACE = re.compile('[\\s]')
+_BYTES_SPACE = re.compile(('[' + _ASCII_SPACE + ']').encode('ascii'))
+
+
 class Parser(Grammar):
-    def __init__(self, input, actions, types):
-        self._input = input
-        self._input_size = len(input)
+    def __init__(self, input, actions, types, encoding='utf-8', fallback='latin-1',
+                 memo=MEMO_RULES, window=False, track=False):
         self._actions = actions
         self._types = types
+        self._encoding = encoding
+        self._fallback = fallback
+        self._tracked = track
+        self._cache = Memo(memo, window)
+        if window:
+            self._moves_open = 0
+            self._read_move = self._read_move_committing
+        self.reset(input)
+
+    def reset(self, input):
+        """Readies the parser to parse another input, keeping its settings
+
+        Args:
+            input: The str or bytes to parse next
+        """
+        if isinstance(input, str):
+            self._data, self._runs, self._space = input, _STR_RUNS, _STR_SPACE
+        else:
+            self._data, self._runs, self._space = input, _BYTES_RUNS, _BYTES_SPACE
+            input = BytesInput(input, self._encoding, self._fallback)
+        self._input = input
+        self._input_size = len(input)
         self._offset = 0
-        self._cache = defaultdict(dict)
-        self._failure = 0
+        self._cache.empty()
+        # Unless tracking, the furthest failure is put out of reach so that no
+        # rule records what it expected, and a failed parse is run again with
+        # tracking to say what went wrong
+        self._track = self._tracked
+        self._failure = 0 if self._track else sys.maxsize
         self._expected = []
 
+    def _read_run(self, cls, minimum):
+        # Matches a run of characters in the class with one regex, as a single
+        # node rather than one per character
+        start = self._offset
+        end = self._runs[cls].match(self._data, start).end()
+        if end > self._failure:
+            self._failure = end
+            self._expected = []
+        if end == self._failure:
+            self._expected.append(cls)
+        if end - start < minimum:
+            return FAILURE
+        self._offset = end
+        return TreeNode(self._input, start, None, end)
+
+    def _read_move_committing(self):
+        # Only a top level move is read while no other move is open, nothing
+        # before its start is backtracked into again
+        if not self._moves_open:
+            self._cache.commit(self._offset)
+        self._moves_open += 1
+        try:
+            return Grammar._read_move(self)
+        finally:
+            self._moves_open -= 1
+
     def parse(self):
-        tree = self._read_game()
+        try:
+            tree = self._read_game()
+        except RecursionError:
+            raise self._too_deep()
         if tree is not FAILURE and self._offset == self._input_size:
             return tree
+        if not self._track:
+            self._start_tracking()
+            return self.parse()
         if not self._expected:
             self._failure = self._offset
             self._expected.append('<EOF>')
-        raise ParseError(format_error(self._input, self._failure, self._expected))
+        raise self._error()
+
+    def parse_rule(self, rule, offset=0):
+        self._offset = offset
+        try:
+            tree = getattr(self, '_read_' + rule)()
+        except RecursionError:
+            raise self._too_deep()
+        if tree is not FAILURE:
+            return tree, self._offset
+        if not self._track:
+            self._start_tracking()
+            return self.parse_rule(rule, offset)
+        if not self._expected:
+            self._failure = self._offset
+            self._expected.append('<' + rule + '>')
+        raise self._error()
+
+    def _start_tracking(self):
+        self._track = True
+        self._offset = 0
+        self._cache = Memo(self._cache.rules, self._cache.window)
+        self._failure = 0
+        self._expected = []
+
+    def _too_deep(self):
+        # Each variation is a level of recursion, so input nested past the
+        # recursion limit fails where the parser had got to
+        self._failure = self._offset
+        self._expected = ['<less deeply nested variations>']
+        return self._error()
+
+    def _error(self):
+        error = ParseError(format_error(self._input, self._failure, self._expected))
+        error.position = self._failure
+        error.expected = self._expected
+        return error
 
 
 def format_error(input, offset, expected):
-    lines, line_no, position = input.split('\n'), 0, 0
-    while position <= offset:
-        position += len(lines[line_no]) + 1
-        line_no += 1
-    message, line = 'Line ' + str(line_no) + ': expected ' + ', '.join(expected) + '\n', lines[line_no - 1]
-    message += line + '\n'
-    position -= len(line) + 1
-    message += ' ' * (offset - position)
+    start = input.rfind('\n', 0, offset) + 1
+    end = input.find('\n', start)
+    if end < 0:
+        end = len(input)
+    line_no = input.count('\n', 0, start) + 1
+    message = 'Line ' + str(line_no) + ': expected ' + ', '.join(expected) + '\n'
+    message += input[start:end] + '\n'
+    message += ' ' * len(input[start:offset])
     return message + '^'
 
-def parse(input, actions=None, types=None):
-    parser = Parser(input, actions, types)
+def parse(input, actions=None, types=None, encoding='utf-8', fallback='latin-1', engine='canopy',
+          memo=MEMO_RULES, window=False):
+    if engine == 'fast':
+        from pgn_parser import fast
+        return fast.parse(input, actions, types, encoding, fallback)
+    if engine == 'direct':
+        from pgn_parser import fast
+        return fast.parse_direct(input, actions, types, encoding, fallback)
+    if engine != 'canopy':
+        raise ValueError('unknown engine: ' + repr(engine))
+    parser = Parser(input, actions, types, encoding, fallback, memo, window)
     return parser.parse()
+
+
+def parse_batch(inputs, actions=None, types=None, encoding='utf-8', fallback='latin-1',
+                engine='canopy', memo=MEMO_RULES, window=False):
+    """Parses many inputs with one parser, reset between them
+
+    Saves the cost of setting up a parser for each input, which is most of
+    the time taken on small ones.
+
+    Args:
+        inputs: An iterable of str or bytes, each a whole game
+        actions: The actions used for every input
+        engine, memo, window: As for parse()
+
+    Yields:
+        What parse() would return for each input in turn. A ParseError is
+        raised for the first input that fails to parse, ending the batch.
+    """
+    if engine == 'fast' or engine == 'direct':
+        from pgn_parser import fast
+        parser = fast.FastParser if engine == 'fast' else fast.DirectParser
+        parser = parser('', actions, types, encoding, fallback)
+    elif engine == 'canopy':
+        parser = Parser('', actions, types, encoding, fallback, memo, window)
+    else:
+        raise ValueError('unknown engine: ' + repr(engine))
+    for input in inputs:
+        parser.reset(input)
+        yield parser.parse()
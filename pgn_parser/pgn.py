@@ -1,5 +1,9 @@
 import pgn_parser.parser as parser
+import pgn_parser.stream as stream
+import asyncio
 import re
+import threading
+from array import array
 from collections import OrderedDict, deque
 
 class Actions:
@@ -110,11 +114,96 @@ class Actions:
         g = Game(e[0], e[2], e[3], s)
         return g
 
+    # The direct engine builds the Game with these in place of the make_
+    # methods, from the matched text rather than parse tree nodes. Optional
+    # parts that are missing are given as None.
+
+    def build_comment(self, text):
+        """Returns the comment str from the text between its braces"""
+        return text.strip('{}')
+
+    def build_tag_pairs(self, pairs):
+        """Creates the TagPairs from a list of (key, value)"""
+        return TagPairs(pairs)
+
+    def build_move(self, move_number, white, wnags, wcomment, wvars, black, bnags, bcomment,
+                   bvars, mcomment):
+        """Creates a Move, sharing out the comments as make_movetext does
+
+        Args:
+            move_number: The move number with its dot, "12."
+            white, black: The SAN of each ply, black's may be ""
+            wnags, bnags: Lists of the nags of each ply as matched
+            wcomment, bcomment, mcomment: The comments after each ply and the move
+            wvars, bvars: Lists of the Movetext of each variation of each ply
+        """
+        mc = ""
+        if bcomment is not None and not black:
+            bcomment, mc = "", bcomment
+        if not mc and mcomment is not None:
+            mc = mcomment
+        move = Move.__new__(Move)
+        move.move_number = int(move_number[:-1])
+        move.white = _ply("w", "" if white == ".." else white, wnags, wcomment, wvars)
+        move.black = _ply("b", black, bnags, bcomment, bvars)
+        move.comment = mc
+        return move
+
+    def build_movetext(self, moves):
+        """Creates the Movetext from a list of Moves"""
+        return Movetext(moves)
+
+    def build_game(self, tag_pairs, gcomment, movetext, score):
+        """Creates the Game, score is its text or "" if it has none"""
+        return Game(tag_pairs, gcomment, movetext, Score(score or '*'))
+
 
 class PGNGameException(Exception):
     pass
 
 
+class GameError:
+    """Where and why a game in a file failed to parse
+
+    Attributes:
+        index: The index of the game in the file, counting from 0
+        offset: The offset in the file the parse failed at
+        line: The line of the file the parse failed on, counting from 1
+        column: The column the parse failed at, counting from 1
+        expected: The list of things the parser expected to find there
+        message: The full error message of the parser
+    """
+
+    def __init__(self, index, offset, line, column, expected, message):
+        self.index = index
+        self.offset = offset
+        self.line = line
+        self.column = column
+        self.expected = expected
+        self.message = message
+
+    def __repr__(self):
+        return "GameError(game {}, line {}, column {}: expected {})".format(
+            self.index, self.line, self.column, ", ".join(self.expected))
+
+    @classmethod
+    def from_parse_error(cls, index, offset, line, text, error):
+        """Locates a ParseError from a game read by stream.read_games
+
+        Args:
+            index: The index of the game in the file
+            offset: The offset of the game in the file
+            line: The line of the file the game starts on
+            text: The text of the game
+            error: The ParseError raised parsing it
+        """
+        newline = '\n' if isinstance(text, str) else b'\n'
+        position = error.position
+        line += text.count(newline, 0, position)
+        column = position - text.rfind(newline, 0, position)
+        return cls(index, offset + position, line, column, error.expected, str(error))
+
+
 class TagPairs(OrderedDict):
     """TagPairs is a slightly customised OrderedDict
 
@@ -149,8 +238,89 @@ class TagPairs(OrderedDict):
         return out
 
 
+def _format(item):
+    """Writes out a Ply, Move or Movetext as pgn
+
+    The parts of each item are written in turn, with a stack of the items
+    being written rather than recursion, so variations can nest to any depth.
+    """
+    out = []
+    stack = [iter(item._parts())]
+    while stack:
+        for part in stack[-1]:
+            if isinstance(part, str):
+                out.append(part)
+            else:
+                stack.append(iter(part._parts()))
+                break
+        else:
+            stack.pop()
+    return "".join(out)
+
+
+def _spaced(moves):
+    """The moves with a space between each"""
+    parts = []
+    for m in moves:
+        if parts:
+            parts.append(" ")
+        parts.append(m)
+    return parts
+
+
+class _EmptyList(list):
+    """An empty list that cannot be added to, shared by every Ply without
+    nags or variations rather than each having lists of its own"""
+    __slots__ = ()
+
+    def _frozen(self, *args):
+        raise TypeError("this empty list is shared and cannot be changed, assign a new list")
+
+    append = extend = insert = __setitem__ = __iadd__ = __imul__ = _frozen
+
+    def __reduce__(self):
+        # Unpickled and copied as the one shared instance
+        return '_EMPTY'
+
+
+_EMPTY = _EmptyList()
+
+
+# Every distinct SAN seen in this process, shared by all games, so that a ply
+# holds a small int code in place of its own str. Code 0 is the empty ply.
+# Codes only mean the same within one process, Plys pickle as their SAN.
+# The table is never pruned, codes fit in an array('H') until there are more
+# than 65536 SANs, then arrays of them are made with 'I', see san_typecode.
+SANS = [""]
+_SAN_CODES = {"": 0}
+_SAN_LOCK = threading.Lock()
+
+
+def san_code(san):
+    """The code of a SAN in SANS, added to the table if it is new"""
+    code = _SAN_CODES.get(san)
+    if code is None:
+        with _SAN_LOCK:
+            code = _SAN_CODES.get(san)
+            if code is None:
+                SANS.append(san)
+                code = _SAN_CODES[san] = len(SANS) - 1
+    return code
+
+
+def san_typecode():
+    """The array typecode that holds every code now in SANS, 'H' or 'I'"""
+    return 'H' if len(SANS) <= 0x10000 else 'I'
+
+
 class Ply:
-    """A Ply is a half a move in a game, either white or blacks side of the move"""
+    """A Ply is a half a move in a game, either white or blacks side of the move
+
+    Attributes:
+        san: The SAN of the ply, "" if empty
+        code: The code of the SAN in SANS, which san is looked up from
+    """
+    __slots__ = ('colour', 'code', 'nags', 'comment', 'variations')
 
     def __init__(self, colour, san, nags=[], comment="", variations=[]):
         """Inits the colour san and any comment of the ply"""
@@ -158,7 +328,8 @@ class Ply:
         self.san = san
         self.nags = self.nodes_to_nags(nags)
         self.comment = comment
-        self.variations = variations
+        # The parser gives an empty node rather than a list for no variations
+        self.variations = list(variations) or _EMPTY
 
     def __str__(self):
         """Stringifies to a single pgn ply
@@ -167,26 +338,62 @@ class Ply:
             <san> {<coment>}
             Ncxe4 {white comment}
         """
+        if self.variations:
+            return _format(self)
+        return self._parts()[0]
+
+    @property
+    def san(self):
+        return SANS[self.code]
+
+    @san.setter
+    def san(self, san):
+        self.code = san_code(san)
+
+    def __getstate__(self):
+        # The code is only good in this process, so the SAN is pickled
+        return self.colour, self.san, self.nags, self.comment, self.variations
+
+    def __setstate__(self, state):
+        self.colour, self.san, self.nags, self.comment, self.variations = state
+
+    def _parts(self):
+        """The pgn of the ply, as strings and the Moves of its variations"""
         out = self.san
         if self.comment != "":
             out += " {" + self.comment.replace('\n', ' ') + "}"
         if len(self.nags) > 0:
             for n in self.nags:
                 out += " " + n
+        parts = [out]
         for v in self.variations:
-            out += " (" + str(v).strip(' ') + ")"
-        return out
+            parts.append(" (")
+            parts.extend(_spaced(v))
+            parts.append(")")
+        return parts
 
     def nodes_to_nags(self, nags):
         """Convert input TreeNode's into a list of string nags"""
         out = []
         for n in nags:
             out.append(n.text.strip(' '))
-        return out
+        return out or _EMPTY
+
+
+def _ply(colour, san, nags, comment, variations):
+    """Creates a Ply from plain values, as Actions.build_move is given them"""
+    ply = Ply.__new__(Ply)
+    ply.colour = colour
+    ply.code = san_code(san)
+    ply.nags = [n.strip(' ') for n in nags] if nags else _EMPTY
+    ply.comment = comment if comment is not None else ""
+    ply.variations = variations or _EMPTY
+    return ply
 
 
 class Move:
     """Representing a move, of 1 or 2 ply along with the move number"""
+    __slots__ = ('move_number', 'white', 'black', 'comment')
 
     def __init__(self, move_number, white, wnags, wcomment, wvars, black, bnags, bcomment, bvars, mcomment):
         """Inits the Move x with the white and or black Ply's"""
@@ -202,16 +409,21 @@ class Move:
         Returns:
             1. e4 e5
         """
-        out = "{}.".format(self.move_number)
-        if self.white.san != "":
-            out += " " + str(self.white)
+        return _format(self)
+
+    def _parts(self):
+        """The pgn of the move, as strings and its Plys"""
+        parts = ["{}.".format(self.move_number)]
+        # Only a ply with variations is left to be written out in turn
+        if self.white.code:
+            parts += [" ", self.white if self.white.variations else str(self.white)]
         else:
-            out += ".."
-        if self.black.san != "":
-            out += " " + str(self.black)
+            parts.append("..")
+        if self.black.code:
+            parts += [" ", self.black if self.black.variations else str(self.black)]
         if self.comment:
-            out += " {" + self.comment + "}"
-        return out
+            parts.append(" {" + self.comment + "}")
+        return parts
 
     def __repr__(self):
         return self.__str__()
@@ -223,6 +435,12 @@ class Move:
 
 
 class Movetext(list):
+    # Move number -> index of its first move, and ply index -> the first Ply
+    # with that index, made on the first lookup and dropped when the list
+    # is changed
+    _numbers = None
+    _plies = None
+
     def __str__(self):
         """Stringifies movetext
 
@@ -231,12 +449,30 @@ class Movetext(list):
         Returns:
             1. e4 {wc} e5 {bc} 2. d4 {wc2} d5 {bc2}
         """
-        out = ""
-        for i, m in enumerate(self):
-            out += " " + str(m) if i > 0 else str(m)
-        out += " "
-        return out
+        return _format(self)
+
+    def _parts(self):
+        """The pgn of the movetext, as strings and its Moves"""
+        return _spaced(self) + [" "]
+
+    def codes(self):
+        """The SAN codes of the plies of the mainline, without its variations
 
+        Two games with the same opening have the same codes up to where they
+        part, and the codes of many games take far less memory than the games.
+
+        Returns:
+            An array of the code in SANS of each ply in order, empty plies
+            are left out. Its typecode is 'H', or 'I' once SANS is too
+            large for 'H', see san_typecode.
+        """
+        out = array(san_typecode())
+        for m in self:
+            if m.white.code:
+                out.append(m.white.code)
+            if m.black.code:
+                out.append(m.black.code)
+        return out
 
     def move(self, find):
         """Returns the move number `find`
@@ -250,22 +486,72 @@ class Movetext(list):
             PGNGameException is raised if the number cannot be found
         """
         first = self[0].move_number
+        if first <= find:
+            i = self._index()[0].get(find)
+            if i is not None:
+                return self[i]
+
         last = self[-1].move_number
         fail = "Move number {} is not in this game. First is {}, last is {}.".format(find, first, last)
-        if first > find:
-            raise PGNGameException(fail)
+        raise PGNGameException(fail)
 
-        for m in self:
-            if find == m.move_number:
-                return m
+    def ply(self, index):
+        """Returns the ply at `index`
 
-        # We haven't found the move
-        raise PGNGameException(fail)
+        Args:
+            index: The index of the ply counting from 0 for white's first move,
+                so 2 * (move number - 1) for white and one more for black, as
+                in GameBatch.ply. A movetext starting with black, "31...", has
+                no ply at the index of white's 31st move.
+
+        Returns:
+            A Ply() object
 
+        Raises:
+            PGNGameException is raised if there is no such ply
+        """
+        ply = self._index()[1].get(index)
+        if ply is None:
+            raise PGNGameException("Ply {} is not in this game.".format(index))
+        return ply
+
+    def _index(self):
+        """The tables of move numbers and plies, made if need be"""
+        if self._numbers is None:
+            numbers, plies = {}, {}
+            for i, m in enumerate(self):
+                numbers.setdefault(m.move_number, i)
+                # A move split by a comment, "1. e4 {c} 1... e5", has each
+                # ply in a different Move
+                white = 2 * (m.move_number - 1)
+                if m.white.code:
+                    plies.setdefault(white, m.white)
+                if m.black.code:
+                    plies.setdefault(white + 1, m.black)
+            self._numbers, self._plies = numbers, plies
+        return self._numbers, self._plies
+
+
+def _dropping_index(name):
+    """The list method `name`, made to drop the tables of a Movetext first"""
+    change = getattr(list, name)
+
+    def changed(self, *args, **kwargs):
+        self._numbers = self._plies = None
+        return change(self, *args, **kwargs)
+    changed.__name__ = name
+    return changed
+
+
+for _name in ('append', 'extend', 'insert', 'pop', 'remove', 'clear', 'sort', 'reverse',
+              '__setitem__', '__delitem__', '__iadd__', '__imul__'):
+    setattr(Movetext, _name, _dropping_index(_name))
+del _name
 
 
 class Score:
     """Representing the score of a game"""
+    __slots__ = ('white', 'black')
 
     def __init__(self, score):
         if score == "*":
@@ -274,7 +560,11 @@ class Score:
             w, b = score.split('-')
         self.white = w
         self.black = b
-        self.result = str(self)
+
+    @property
+    def result(self):
+        """The score as a str, 1-0, 0-1, 1/2-1/2 or *"""
+        return str(self)
 
     def __str__(self):
         """Stringifies the score to one of the leg possiblities
@@ -342,3 +632,442 @@ class Game:
         An alias for self.movetext.move()
         """
         return self.movetext.move(find)
+
+    def ply(self, index):
+        """Returns the ply at `index`
+        An alias for self.movetext.ply()
+        """
+        return self.movetext.ply(index)
+
+    def codes(self):
+        """The SAN codes of the mainline
+        An alias for self.movetext.codes()
+        """
+        return self.movetext.codes()
+
+
+class LazyGame(Game):
+    """A Game whose movetext is only parsed the first time it is used
+
+    The tag pairs are parsed and the score read from the end of the text
+    straight away, the rest waits until movetext, comment or any method that
+    needs them is used. Until then the text of the game is kept, and a
+    ParseError in the movetext is only raised then. See parse_lazy.
+    """
+
+    def __init__(self, text, tag_pairs, score, actions, encoding="utf-8", engine="canopy"):
+        self.tag_pairs = tag_pairs
+        self.score = score
+        self._text = text
+        self._parse = (actions, encoding, engine)
+        self._movetext = None
+        self._comment = None
+
+    @property
+    def movetext(self):
+        self._load()
+        return self._movetext
+
+    @movetext.setter
+    def movetext(self, movetext):
+        self._load()
+        self._movetext = movetext
+
+    @property
+    def comment(self):
+        self._load()
+        return self._comment
+
+    @comment.setter
+    def comment(self, comment):
+        self._load()
+        self._comment = comment
+
+    @property
+    def loaded(self):
+        """Whether the movetext has been parsed yet"""
+        return self._text is None
+
+    def _load(self):
+        if self._text is None:
+            return
+        actions, encoding, engine = self._parse
+        game = parser.parse(self._text, actions=actions, encoding=encoding, engine=engine)
+        self._movetext, self._comment = game.movetext, game.comment
+        # The score read from the text is replaced by the parsed one, which
+        # is the same for any game that parses
+        self.score = game.score
+        self._text = self._parse = None
+
+
+class LiveGame:
+    """A game still being played, parsed again each time its pgn grows
+
+    Usage:
+        live = LiveGame()
+        game = live.update(pgn_so_far)  # As often as the broadcast changes
+
+    Every move but the last is kept from the previous update, so only the
+    last move and what was added after it are parsed. The tag section is
+    parsed every time, as broadcasts update tags like Result and clocks.
+    make_movetext is called for one move at a time.
+
+    Attributes:
+        game: The Game from the last update, or None
+    """
+
+    def __init__(self, actions=None, encoding="utf-8"):
+        """Starts with no game
+
+        Args:
+            actions: The actions to parse with, a new Actions() by default
+            encoding: The encoding of the pgn if given as bytes
+        """
+        self.actions = actions if actions is not None else Actions()
+        self.encoding = encoding
+        self.game = None
+        self._done = None
+        self._moves = []
+
+    def update(self, text):
+        """Parses the latest pgn of the game
+
+        Args:
+            text: The whole pgn of the game so far, str or bytes
+
+        Returns:
+            The Game
+
+        Raises:
+            parser.ParseError if the pgn is not valid
+        """
+        try:
+            game = self._parse(text)
+        except parser.ParseError:
+            game = None
+        if game is None:
+            # Something the moves alone could not handle, from a rewritten game
+            # to invalid pgn, so the full parser gives the Game or the error
+            self._done, self._moves = None, []
+            game = parser.parse(text, actions=self.actions, encoding=self.encoding)
+        self.game = game
+        return game
+
+    def _parse(self, text):
+        """Parses from the start of the last move of the previous update
+
+        Returns:
+            The Game, or None if the text has to be parsed from the start
+        """
+        actions = self.actions
+        p = parser.Parser(text, actions, None, self.encoding)
+        tag_pairs, pos = p.parse_rule('tag_pairs')
+        newline, brace = ("\n", "{") if isinstance(text, str) else (b"\n", b"{")
+        nl = parser.TreeNode('', pos)
+        if text[pos:pos + 1] == newline:
+            nl = parser.TreeNode('\n', pos)
+            pos += 1
+        gcomment = parser.TreeNode('', pos)
+        if text[pos:pos + 1] == brace:
+            gcomment, pos = p.parse_rule('comment', pos)
+
+        start = pos
+        if self._done is not None and text.startswith(self._done, start):
+            moves = Movetext(self._moves)
+            pos += len(self._done)
+        else:
+            moves = Movetext()
+        last = None
+        while True:
+            try:
+                move, end = p.parse_rule('move', pos)
+            except parser.ParseError:
+                break
+            moves.extend(actions.make_movetext(text, pos, end, [move]))
+            last, pos = pos, end
+
+        try:
+            score, pos = p.parse_rule('score', pos)
+        except parser.ParseError:
+            score = parser.TreeNode('', pos)
+        if text[pos:].strip():
+            return None
+
+        if last is None:
+            self._done, self._moves = None, []
+        else:
+            self._done, self._moves = text[start:last], moves[:-1]
+        elements = [tag_pairs, nl, gcomment, moves, score, parser.TreeNode('', pos)]
+        return actions.make_game(text, 0, len(text), elements)
+
+
+class GameFeeder:
+    """Parses the games in input pushed to it in chunks of any size
+
+    Usage:
+        feeder = GameFeeder()
+        for chunk in chunks:
+            for game in feeder.feed(chunk):
+                ...
+        for game in feeder.close():
+            ...
+
+    A game is parsed as soon as its score, or the next game's tag section,
+    has arrived. Only the unfinished tail of the input is buffered. Bytes
+    compressed with gzip, bz2 or xz are decompressed as they arrive, as with
+    iter_games.
+    """
+
+    def __init__(self, actions=None, encoding="utf-8", on_error=None, engine="canopy"):
+        """Starts with no input
+
+        Args:
+            actions: The actions to parse with, a new Actions() by default
+            encoding: The encoding of the input when fed bytes
+            on_error: A function to call with a GameError for each game that
+                fails to parse, instead of raising the ParseError
+            engine: The parser engine to use, see parser.parse
+        """
+        self.actions = actions if actions is not None else Actions()
+        self.encoding = encoding
+        self.on_error = on_error
+        self.engine = engine
+        self._splitter = stream.Splitter()
+        self._decompressor = None
+        self._pending = deque()
+        self._index = 0
+
+    def feed(self, chunk):
+        """Adds a chunk of input, str or bytes
+
+        Returns:
+            An iterator of the Games completed so far. A ParseError raised by
+            it drops the bad game only, the games after it are still given by
+            the next feed() or close().
+        """
+        if not isinstance(chunk, str):
+            if self._decompressor is None:
+                self._decompressor = stream.Decompressor()
+            chunk = self._decompressor.feed(chunk)
+        self._pending.extend(self._splitter.feed(chunk))
+        return self._games()
+
+    def close(self):
+        """Marks the end of the input
+
+        Returns:
+            An iterator of the remaining Games, a game without a score at the
+            end of the input is complete now
+        """
+        if self._decompressor is not None:
+            self._pending.extend(self._splitter.feed(self._decompressor.close()))
+        self._pending.extend(self._splitter.close())
+        return self._games()
+
+    def _games(self):
+        while self._pending:
+            offset, line, text = self._pending.popleft()
+            index = self._index
+            self._index += 1
+            try:
+                game = _parse_game(text, self.actions, self.encoding, self.engine)
+            except parser.ParseError as e:
+                if self.on_error is None:
+                    raise
+                self.on_error(GameError.from_parse_error(index, offset, line, text, e))
+                continue
+            yield game
+
+
+def iter_games(source, actions=None, encoding="utf-8", chunk_size=1 << 16, where=None,
+               on_error=None, engine="canopy", lazy=False):
+    """Parses every game in a pgn file, one at a time
+
+    The file is read in chunks and cut into games as it goes, so only the game
+    being parsed is held in memory however large the file is.
+
+    Args:
+        source: A path, or a file object opened in binary or text mode
+        actions: The actions to parse with, a new Actions() by default
+        encoding: The encoding of the file when read as bytes, only the tag
+            values and comments are decoded, falling back to latin-1 for any
+            that are not valid in this encoding
+        chunk_size: How much of the file to read at once
+        where: A function given the TagPairs of each game, only games it
+            returns True for are parsed any further. The tag section is parsed
+            on its own first, so skipped games cost little more than with
+            iter_headers.
+        on_error: A function to call with a GameError for each game that fails
+            to parse, instead of raising the ParseError. Parsing carries on
+            with the next game.
+        engine: The parser engine to use, see parser.parse
+        lazy: True to yield LazyGames, which only parse their movetext when
+            it is used. Errors in the movetext are then raised on that use,
+            rather than here or to on_error.
+
+    Yields:
+        A Game for each game in the file, in order
+    """
+    if actions is None:
+        actions = Actions()
+    games = stream.read_games(source, chunk_size)
+    for index, (offset, line, text) in enumerate(games):
+        try:
+            tag_pairs = None
+            if where is not None:
+                tag_pairs = _headers(text, actions, encoding)
+                if not where(tag_pairs):
+                    continue
+            if lazy:
+                game = _lazy_game(text, actions, encoding, engine, tag_pairs)
+            else:
+                game = _parse_game(text, actions, encoding, engine)
+        except parser.ParseError as e:
+            if on_error is None:
+                raise
+            on_error(GameError.from_parse_error(index, offset, line, text, e))
+            continue
+        yield game
+
+
+async def aiter_games(reader, actions=None, encoding="utf-8", chunk_size=1 << 16,
+                      executor=None, max_pending=8, engine="canopy"):
+    """Parses the games arriving on an asyncio stream, one at a time
+
+    Usage:
+        async for game in pgn.aiter_games(reader):
+            ...
+
+    Games are cut out of the input as it arrives and parsed in `executor`, so
+    the event loop is never blocked by parsing. No more input is read while
+    `max_pending` games are waiting to be parsed or collected, which keeps a
+    slow consumer from buffering an entire upload. Compressed input is
+    decompressed as it arrives, as with iter_games.
+
+    Args:
+        reader: An asyncio.StreamReader, or anything with an async read(n)
+        actions: The actions to parse with, a new Actions() by default
+        encoding: The encoding of the input
+        chunk_size: How much to read at once
+        executor: Where to parse, the loop's default thread pool if None. A
+            ProcessPoolExecutor parses on other cores, but needs actions
+            that can be pickled.
+        max_pending: How many games can be waiting before reading pauses
+        engine: The parser engine to use, see parser.parse
+
+    Yields:
+        A Game for each game in the input, in order
+    """
+    if actions is None:
+        actions = Actions()
+    loop = asyncio.get_event_loop()
+    splitter = stream.Splitter()
+    decompressor = stream.Decompressor()
+    pending = deque()
+    eof = False
+    while pending or not eof:
+        while pending and (eof or pending[0].done() or len(pending) >= max_pending):
+            yield await pending.popleft()
+        if eof:
+            continue
+        chunk = await reader.read(chunk_size)
+        eof = not chunk
+        if isinstance(chunk, bytes):
+            chunk = decompressor.close() if eof else decompressor.feed(chunk)
+        games = splitter.feed(chunk)
+        if eof:
+            games += splitter.close()
+        for offset, line, text in games:
+            pending.append(loop.run_in_executor(
+                executor, _parse_game, text, actions, encoding, engine))
+
+
+def _parse_game(text, actions, encoding, engine="canopy"):
+    """Parses a game read by stream.read_games or a Splitter"""
+    return parser.parse(text, actions=actions, encoding=encoding, engine=engine)
+
+
+def parse_tag_pairs(input, actions=None, encoding="utf-8"):
+    """Parses just the tag section at the start of a game
+
+    Args:
+        input: The pgn text of a game, anything after its tag section is ignored
+        actions: The actions to parse with, a new Actions() by default
+        encoding: The encoding of input if it is bytes
+
+    Returns:
+        The TagPairs of the game
+    """
+    if actions is None:
+        actions = Actions()
+    p = parser.Parser(input, actions, None, encoding)
+    tag_pairs, _ = p.parse_rule('tag_pairs')
+    return tag_pairs
+
+
+def parse_lazy(input, actions=None, encoding="utf-8", engine="canopy"):
+    """Parses the tag section of a game, leaving the movetext until it is used
+
+    Args:
+        input: The pgn text of a game
+        actions: The actions to parse with, a new Actions() by default. They
+            must make a Game, as the movetext is taken from it.
+        encoding: The encoding of input if it is bytes
+        engine: The parser engine to parse the movetext with, see parser.parse
+
+    Returns:
+        A LazyGame
+    """
+    if actions is None:
+        actions = Actions()
+    return _lazy_game(input, actions, encoding, engine)
+
+
+def _lazy_game(text, actions, encoding, engine, tag_pairs=None):
+    """Makes a LazyGame, from the tag pairs if they have been parsed already"""
+    if tag_pairs is None:
+        tag_pairs = _headers(text, actions, encoding)
+    return LazyGame(text, tag_pairs, _read_score(text), actions, encoding, engine)
+
+
+# The scores a game can end with, longest first
+_SCORES = ("1/2-1/2", "1-0", "0-1", "*")
+_BYTES_SCORES = tuple(s.encode('ascii') for s in _SCORES)
+
+
+def _read_score(text):
+    """The Score at the end of a game's text, found without parsing it"""
+    end = text.rstrip()
+    scores = _BYTES_SCORES if isinstance(text, bytes) else _SCORES
+    for score, raw in zip(_SCORES, scores):
+        if end.endswith(raw):
+            return Score(score)
+    return Score("*")
+
+
+def iter_headers(source, actions=None, encoding="utf-8", chunk_size=1 << 16):
+    """Parses only the tag section of every game in a pgn file
+
+    The movetext is skipped over by the same scanner that finds where each game
+    ends, without being parsed, which is many times quicker than iter_games.
+
+    Args:
+        source: A path, or a file object opened in binary or text mode
+        actions: The actions to parse with, a new Actions() by default
+        encoding: The encoding of the file when read as bytes, only the tag
+            values and comments are decoded, falling back to latin-1 for any
+            that are not valid in this encoding
+        chunk_size: How much of the file to read at once
+
+    Yields:
+        The TagPairs of each game in the file, in order
+    """
+    if actions is None:
+        actions = Actions()
+    for offset, line, text in stream.read_games(source, chunk_size):
+        yield _headers(text, actions, encoding)
+
+
+def _headers(text, actions, encoding):
+    """Parses the tag section of a game read by stream.read_games"""
+    return parse_tag_pairs(text[:stream.tags_end(text, 0)], actions, encoding)
@@ -0,0 +1,401 @@
+"""Splitting a stream of pgn text into its individual games
+
+A pgn database is many games one after another, each a tag section followed by
+movetext and a score. The functions here only find where each game starts and
+ends, jumping over comments, variations and tag values without building
+anything, so a file can be cut into games far quicker than it can be parsed.
+
+Everything works on either str or bytes, the structural characters of pgn are
+all ASCII so byte offsets in an encoded file are found just as well.
+
+Files compressed with gzip, bz2 or xz are recognised by their first bytes and
+decompressed as they are read.
+"""
+import bz2
+import lzma
+import re
+import zlib
+
+
+class _Syntax:
+    """The patterns used to find game boundaries, compiled for str or bytes"""
+
+    def __init__(self, encode):
+        self.tags = re.compile(encode(r'(?:\[[^\]"]*(?:"[^"]*"[^\]"]*)*\]\s*)*'))
+        self.space = re.compile(encode(r'\s*'))
+        # Groups are, in order: comment, variation start, variation end, tag
+        # pair start, unknown score and a dash that may be part of a score.
+        # The lookahead lets the regex skip quickly to the next candidate.
+        self.token = re.compile(encode(r'(?=[{()\[*-])(?:(\{)|(\()|(\))|(\[)|(\*)|(-))'))
+        self.before_score = re.compile(encode(r'[0-9A-Za-z/.-]'))
+        # A tag pair at the start of a line, taken as the next game even in
+        # a variation or comment left open, so one bad game cannot swallow
+        # the rest of the file. The prefix is what may be the start of one.
+        self.new_game = re.compile(encode(r'\n\[\s?[A-Za-z0-9_]+\s?"'))
+        self.new_game_prefix = re.compile(encode(r'\n(?:\[\s?[A-Za-z0-9_]*\s?)?'))
+        self.scores = (encode('1-0'), encode('0-1'))
+        self.draw = encode('1/2-1/2')
+        self.two = encode('2')
+        self.open_tag = encode('[')
+        self.close_comment = encode('}')
+        self.newline = encode('\n')
+
+
+_STR = _Syntax(lambda s: s)
+_BYTES = _Syntax(lambda s: s.encode('ascii'))
+
+
+def _syntax(buf):
+    return _STR if isinstance(buf, str) else _BYTES
+
+
+def tags_end(buf, start):
+    """Returns the offset just past the tag section of the game at `start`"""
+    return _syntax(buf).tags.match(buf, start).end()
+
+
+def game_end(buf, start, final=True):
+    """Finds the end of the game beginning at `start`
+
+    A game ends just after its score, or if it has no score, at the last non
+    whitespace character before the next tag section. A tag pair starting a
+    line also ends a game left inside a variation or comment.
+
+    Args:
+        buf: str, bytes or mmap holding the game
+        start: Offset of the first character of the game
+        final: Whether buf holds the rest of the input, if not a game without
+            a visible end is unfinished rather than running to the end of buf
+
+    Returns:
+        The offset just past the end of the game, or -1 if it is unfinished
+    """
+    return _game_end(buf, start, final)[0]
+
+
+def _game_end(buf, start, final, resume=None):
+    """game_end, carrying on from `resume` if given
+
+    Returns:
+        (end, resume), where for an unfinished game resume is the (offset,
+        depth) to carry on scanning from once more input has arrived
+    """
+    syn = _syntax(buf)
+    size = len(buf)
+    if resume is not None:
+        (pos, depth), body = resume, -1
+    else:
+        pos = syn.tags.match(buf, start).end()
+        if buf[pos:pos + 1] == syn.open_tag:
+            # A tag pair that is not closed, the rest of it has not arrived yet
+            if not final:
+                return -1, None
+            pos += 1
+        depth = 0
+        # Until something follows the tags more of them may arrive, so the
+        # game is scanned again from its start
+        body = syn.space.match(buf, pos).end()
+
+    def unfinished(pos):
+        return -1, ((pos, depth) if pos > body else None)
+
+    search = syn.token.search
+    while True:
+        m = search(buf, pos)
+        if m is None:
+            return (size, None) if final else unfinished(pos)
+        kind = m.lastindex
+        if kind == 1:
+            close = buf.find(syn.close_comment, m.end())
+            new_game = _new_game(buf, m.end(), size if close < 0 else close, final, syn)
+            if new_game is None:
+                return unfinished(m.start())
+            if new_game >= 0:
+                return _trim(buf, start, new_game), None
+            if close < 0:
+                return (size, None) if final else unfinished(m.start())
+            pos = close + 1
+        elif kind == 2:
+            depth += 1
+            pos = m.end()
+        elif kind == 3:
+            if depth:
+                depth -= 1
+            pos = m.end()
+        elif kind == 4:
+            if depth == 0:
+                # The next game's tag section, so this game had no score
+                return _trim(buf, start, m.start()), None
+            new_game = _new_game(buf, m.start() - 1, m.end(), final, syn)
+            if new_game is None:
+                return unfinished(m.start())
+            if new_game >= 0:
+                return _trim(buf, start, new_game), None
+            pos = m.end()
+        elif kind == 5 and depth == 0:
+            return m.end(), None
+        elif kind == 6 and depth == 0:
+            if not final:
+                # Wait for the rest of a score cut off by the end of buf, a
+                # draw's dash follows a 2 and the others follow a 0 or 1
+                rest = 4 if buf[m.start() - 1:m.start()] == syn.two else 2
+                if m.start() + rest > size:
+                    return unfinished(m.start())
+            end = _score_end(buf, start, m.start(), syn)
+            if end > 0:
+                return end, None
+            pos = m.end()
+        else:
+            pos = m.end()
+
+
+def _new_game(buf, pos, end, final, syn):
+    """Where a tag pair starting a line, found from pos up to end, begins
+
+    Returns:
+        Its offset, -1 if there is none, or None if one may be cut off by
+        the end of buf
+    """
+    while True:
+        pos = buf.find(syn.newline, pos, end)
+        if pos < 0:
+            return -1
+        if syn.new_game.match(buf, pos):
+            return pos + 1
+        if not final and syn.new_game_prefix.match(buf, pos).end() == len(buf):
+            return None
+        pos += 1
+
+
+def _trim(buf, start, end):
+    """Moves end back over any whitespace ending the game"""
+    while end > start and buf[end - 1:end].isspace():
+        end -= 1
+    return end
+
+
+def _score_end(buf, game, dash, syn):
+    """Returns the end of the score around the `dash`, or -1 if not a score
+
+    Only what is after `game`, the start of the game, is looked at.
+    """
+    if dash >= 1 and buf[dash - 1:dash + 2] in syn.scores:
+        start, end = dash - 1, dash + 2
+    elif dash >= 3 and buf[dash - 3:dash + 4] == syn.draw:
+        start, end = dash - 3, dash + 4
+    else:
+        return -1
+    if start < game or start > game and syn.before_score.match(buf, start - 1):
+        return -1
+    return end
+
+
+def scan_games(buf, pos=0, final=True, starts=None, ends=None):
+    """Finds every game in buf from pos onwards
+
+    The start and end offsets of each game found are appended to `starts` and
+    `ends`, which can be lists or arrays, so a scan allocates nothing per game.
+
+    Args:
+        buf: str, bytes or mmap of pgn text
+        pos: Offset to begin scanning from, must not be inside a game
+        final: Whether buf holds the rest of the input, see game_end()
+        starts: A list to append the start offset of each game to
+        ends: A list to append the end offset of each game to
+
+    Returns:
+        The offset scanning stopped at, the start of an unfinished game or
+        len(buf) if every game was found
+    """
+    return _scan_games(buf, pos, final, starts, ends)[0]
+
+
+def _scan_games(buf, pos, final, starts, ends, resume=None):
+    """scan_games, carrying on in the game at pos from `resume` if given
+
+    Returns:
+        (stop, resume) with the resume of the unfinished game at stop
+    """
+    if starts is None:
+        starts = []
+    if ends is None:
+        ends = []
+    skip = _syntax(buf).space.match
+    size = len(buf)
+    while True:
+        if resume is None:
+            pos = skip(buf, pos).end()
+            if pos >= size:
+                return size, None
+        end, resume = _game_end(buf, pos, final, resume)
+        if end < 0:
+            return pos, resume
+        starts.append(pos)
+        ends.append(end)
+        pos = end
+
+
+class Splitter:
+    """Cuts pgn text arriving in arbitrary chunks into whole games
+
+    Only the unfinished tail of the input is kept between chunks, so the
+    memory used is bounded by the largest game rather than the whole input.
+    """
+
+    def __init__(self):
+        self._buffer = None
+        self._offset = 0
+        self._line = 1
+        # Where scanning of the unfinished game at the start of the buffer
+        # stopped, so each chunk is only scanned once
+        self._resume = None
+
+    def feed(self, chunk):
+        """Adds a chunk of input
+
+        Returns:
+            A list of (offset, line, text) for every game completed by this
+            chunk, offset and line being where the game starts in the whole
+            input, counting lines from 1
+        """
+        if self._buffer is None:
+            self._buffer = chunk
+        elif chunk:
+            self._buffer += chunk
+        return self._split(False)
+
+    def close(self):
+        """Marks the end of the input
+
+        Returns:
+            A list of (offset, line, text) for the games still buffered
+        """
+        if self._buffer is None:
+            return []
+        return self._split(True)
+
+    def _split(self, final):
+        buf = self._buffer
+        starts, ends = [], []
+        stop, resume = _scan_games(buf, 0, final, starts, ends, self._resume)
+        if resume is not None:
+            resume = (resume[0] - stop, resume[1])
+        self._resume = resume
+        newline = '\n' if isinstance(buf, str) else b'\n'
+        games, pos = [], 0
+        for s, e in zip(starts, ends):
+            self._line += buf.count(newline, pos, s)
+            pos = s
+            games.append((self._offset + s, self._line, buf[s:e]))
+        if stop:
+            self._line += buf.count(newline, pos, stop)
+            self._buffer = buf[stop:]
+            self._offset += stop
+        return games
+
+
+# The leading bytes of each compressed format, and how to decompress it
+_COMPRESSION = (
+    (b'\x1f\x8b', lambda: zlib.decompressobj(16 + zlib.MAX_WBITS)),
+    (b'BZh', bz2.BZ2Decompressor),
+    (b'\xfd7zXZ\x00', lambda: lzma.LZMADecompressor(lzma.FORMAT_XZ)),
+)
+_MAGIC_SIZE = 6
+
+
+def is_compressed(head):
+    """Whether bytes beginning a file are the start of a compressed format"""
+    return any(head.startswith(magic) for magic, _ in _COMPRESSION)
+
+
+class Decompressor:
+    """Undoes gzip, bz2 or xz compression of input arriving in chunks
+
+    The format is detected from the first bytes, input that is not compressed
+    is passed through untouched. Files of several concatenated compressed
+    streams, as made by appending to a .gz, are decompressed in full.
+    """
+
+    def __init__(self):
+        self._head = b''
+        self._make = None
+        self._decompressor = None
+        self._detected = False
+
+    def feed(self, chunk):
+        """Adds a chunk of input, returning what it decompresses to"""
+        if not self._detected:
+            self._head += chunk
+            if len(self._head) < _MAGIC_SIZE:
+                return b''
+            chunk, self._head = self._head, b''
+            self._detect(chunk)
+        if self._make is None:
+            return chunk
+        return self._decompress(chunk)
+
+    def close(self):
+        """Marks the end of the input, returning anything still held back"""
+        if not self._detected:
+            chunk, self._head = self._head, b''
+            self._detect(chunk)
+            return self.feed(chunk) if self._make is not None else chunk
+        return b''
+
+    def _detect(self, head):
+        self._detected = True
+        for magic, make in _COMPRESSION:
+            if head.startswith(magic):
+                self._make = make
+                self._decompressor = make()
+
+    def _decompress(self, data):
+        out = []
+        while data:
+            out.append(self._decompressor.decompress(data))
+            if not self._decompressor.eof:
+                break
+            # The start of another compressed stream, if anything
+            data = self._decompressor.unused_data
+            self._decompressor = self._make()
+        return b''.join(out)
+
+
+def read_games(source, chunk_size=1 << 16):
+    """Reads the games from a pgn file one at a time
+
+    Compressed files are decompressed as they are read, see Decompressor.
+
+    Args:
+        source: A path, or a file object opened in binary or text mode
+        chunk_size: How much of the file to read at once
+
+    Yields:
+        (offset, line, text) of each game, text is bytes unless read from a
+        text mode file object. The offset is into the decompressed text.
+    """
+    if hasattr(source, 'read'):
+        f, close = source, False
+    else:
+        f, close = open(source, 'rb'), True
+    try:
+        splitter = Splitter()
+        decompressor = None
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            if not isinstance(chunk, str):
+                if decompressor is None:
+                    decompressor = Decompressor()
+                chunk = decompressor.feed(chunk)
+            for game in splitter.feed(chunk):
+                yield game
+        if decompressor is not None:
+            for game in splitter.feed(decompressor.close()):
+                yield game
+        for game in splitter.close():
+            yield game
+    finally:
+        if close:
+            f.close()
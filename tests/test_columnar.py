@@ -0,0 +1,64 @@
+import pgn_parser.parser as parser
+import pgn_parser.columnar as columnar
+import pgn_parser.pgn as pgn
+from pgn_parser.columnar import GameBatch, RESULTS
+from pgn_parser.pgn import Actions, san_code
+import pytest
+
+
+GAMES = [
+    '[White "A"]\n[Black "B"]\n\n1. e4 $1 {best} (1. d4) e5 2. Nf3 $2 $14 1-0',
+    b'[White "C"]\n[Site "x"]\n\n{game} 12... Nf6 13. e4 {white} *',
+    '1. Nf3',
+]
+
+COLUMNS = ['game', 'ply', 'san', 'nag_start', 'nags', 'comment_start', 'comment_end',
+           'game_start', 'result', 'tags', 'text']
+
+
+class TestGameBatch:
+    """Test games are laid out in columns, the same whether parsed or from Games"""
+
+    def test_columns(self):
+        batch = GameBatch.parse(GAMES)
+        assert len(batch) == 3
+        assert list(batch.game) == [0, 0, 0, 1, 1, 2]
+        assert list(batch.ply) == [0, 1, 2, 23, 24, 0]
+        assert list(batch.san) == [san_code(s) for s in ["e4", "e5", "Nf3", "Nf6", "e4", "Nf3"]]
+        assert batch.ply_san(3) == "Nf6"
+        assert [list(batch.ply_nags(row)) for row in range(6)] == [[1], [], [2, 14], [], [], []]
+        assert [batch.comment(row) for row in range(6)] == ["best", "", "", "", "white", ""]
+        assert [list(batch.plies(i)) for i in range(3)] == [[0, 1, 2], [3, 4], [5]]
+        assert [RESULTS[r] for r in batch.result] == ["1-0", "*", "*"]
+        assert batch.tags == {"White": ["A", "C", None], "Black": ["B", None, None],
+                              "Site": [None, "x", None]}
+
+    def test_from_games(self):
+        games = [parser.parse(g, actions=Actions()) for g in GAMES]
+        parsed, built = GameBatch.parse(GAMES), GameBatch.from_games(games)
+        for column in COLUMNS:
+            assert getattr(parsed, column) == getattr(built, column)
+
+    def test_append_after_text(self):
+        batch = GameBatch.parse(GAMES[:1])
+        assert batch.text == "best"
+        batch.append(parser.parse('1. d4 {more} *', actions=Actions()))
+        assert batch.text == "bestmore"
+        assert batch.comment(3) == "more"
+
+    def test_error(self):
+        with pytest.raises(parser.ParseError):
+            GameBatch.parse(['1. e4 *', '1. e4 ?'])
+
+    def test_codes_past_16_bits(self, monkeypatch):
+        sans = [""]
+        monkeypatch.setattr(pgn, "SANS", sans)
+        monkeypatch.setattr(pgn, "_SAN_CODES", {"": 0})
+        monkeypatch.setattr(columnar, "SANS", sans)
+        batch = GameBatch.parse(['1. d4 *'])
+        for i in range(0xffff):
+            san_code("pad%d" % i)
+        batch.append(parser.parse('1. e4 e5 *', actions=Actions()))
+        assert batch.san.typecode == "I"
+        assert list(batch.san) == [1, 0x10001, 0x10002]
+        assert [batch.ply_san(row) for row in range(3)] == ["d4", "e4", "e5"]
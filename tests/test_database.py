@@ -0,0 +1,146 @@
+from pgn_parser import database
+from pgn_parser.database import PGNDatabase
+import gzip
+import os
+import pytest
+
+
+GAMES = ['[Site "a"]\n\n1. e4 {é} e5 1-0',
+         '[Site "b"]\n\n1. d4 (1. c4 c5) d5 0-1',
+         '[Site "c"]\n\n1. c4 *']
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / "db.pgn"
+    path.write_bytes("\n\n".join(GAMES).encode())
+    return str(path)
+
+
+class TestPGNDatabase:
+    """Test random access to the games of a file"""
+
+    def test_len(self, db_path):
+        with PGNDatabase(db_path) as db:
+            assert len(db) == 3
+
+    def test_getitem(self, db_path):
+        with PGNDatabase(db_path) as db:
+            assert db[1].tag_pairs["Site"] == "b"
+            assert db[0].move(1).white.comment == "é"
+            assert db[-1].score.result == "*"
+
+    def test_getitem_out_of_range(self, db_path):
+        with PGNDatabase(db_path) as db:
+            with pytest.raises(IndexError):
+                db[3]
+
+    def test_span(self, db_path):
+        with PGNDatabase(db_path) as db:
+            offset, length = db.span(1)
+            assert db.text(1).decode() == GAMES[1]
+            assert length == len(GAMES[1].encode())
+
+    def test_iter(self, db_path):
+        with PGNDatabase(db_path) as db:
+            assert [g.tag_pairs["Site"] for g in db] == ["a", "b", "c"]
+
+    def test_compressed(self, tmp_path):
+        path = tmp_path / "db.pgn.gz"
+        path.write_bytes(gzip.compress("\n\n".join(GAMES).encode()))
+        with pytest.raises(ValueError):
+            PGNDatabase(str(path))
+
+    def test_empty(self, tmp_path):
+        path = tmp_path / "empty.pgn"
+        path.write_bytes(b"")
+        with PGNDatabase(str(path)) as db:
+            assert len(db) == 0
+
+
+class TestSidecar:
+    """Test keeping the index in a sidecar file"""
+
+    def test_sidecar_written(self, db_path):
+        with PGNDatabase(db_path, sidecar=True) as db:
+            assert len(db) == 3
+        with PGNDatabase(db_path, sidecar=True) as db:
+            assert db._index_map is not None
+            assert len(db) == 3
+            assert db[1].tag_pairs["Site"] == "b"
+            assert db.text(2).decode() == GAMES[2]
+
+    def test_sidecar_tags(self, db_path):
+        with PGNDatabase(db_path, sidecar=True) as db:
+            pass
+        with PGNDatabase(db_path, sidecar=True) as db:
+            assert db.tags(0) == {}
+        with open(db_path, "ab") as f:
+            f.write(b'\n\n[White "Tal"]\n[Result "1-0"]\n\n1. e4 1-0')
+        with PGNDatabase(db_path, sidecar=True) as db:
+            assert db.tags(3) == {"White": "Tal", "Result": "1-0"}
+
+    def test_sidecar_tags_latin_1(self, db_path):
+        with open(db_path, "ab") as f:
+            f.write('\n\n[White "R\xe9ti"]\n\n1. e4 1-0'.encode("latin-1"))
+        with PGNDatabase(db_path, sidecar=True) as db:
+            pass
+        with PGNDatabase(db_path, sidecar=True) as db:
+            assert db[3].tag_pairs["White"] == "R\xe9ti"
+            assert db.tags(3) == {"White": "R\xe9ti"}
+        with open(db_path, "ab") as f:
+            f.write(b'\n\n[Black "\x80"]\n\n1. e4 1-0')
+        with PGNDatabase(db_path, fallback="cp1252") as db:
+            assert db.tags(4) == {"Black": "\u20ac"}
+            assert db[4].tag_pairs["Black"] == "\u20ac"
+
+    def test_tags_without_sidecar(self, db_path):
+        with open(db_path, "ab") as f:
+            f.write(b'\n\n[White "Tal"]\n\n1. e4 1-0')
+        with PGNDatabase(db_path) as db:
+            assert db.tags(3) == {"White": "Tal"}
+
+    def test_sidecar_appended(self, db_path):
+        with open(db_path, "ab") as f:
+            f.write(b'\n\n[Site "d"]\n\n1. f4')
+        with PGNDatabase(db_path, sidecar=True) as db:
+            assert len(db) == 4
+        with open(db_path, "ab") as f:
+            f.write(b' f5 1-0\n\n[Site "e"]\n\n1. g4 1-0')
+        with PGNDatabase(db_path, sidecar=True) as db:
+            assert len(db) == 5
+            assert str(db[3].move(1)) == "1. f4 f5"
+            assert db[4].tag_pairs["Site"] == "e"
+
+    def test_sidecar_rewritten(self, db_path):
+        with PGNDatabase(db_path, sidecar=True) as db:
+            pass
+        with open(db_path, "wb") as f:
+            f.write(b'[Site "z"]\n\n1. e4 1-0')
+        with PGNDatabase(db_path, sidecar=True) as db:
+            assert len(db) == 1
+            assert db[0].tag_pairs["Site"] == "z"
+
+    def test_sidecar_edited_same_size(self, tmp_path):
+        """An edit that keeps the size, before the tail the crc covers, is reindexed"""
+        games = ['[White "Tal"]\n[Result "1-0"]\n\n1. e4 1-0']
+        games += ['[Site "{:03}"]\n\n1. d4 d5 0-1'.format(i) for i in range(500)]
+        path = tmp_path / "big.pgn"
+        path.write_bytes("\n\n".join(games).encode())
+        assert path.stat().st_size > 2 * database._TAIL
+        with PGNDatabase(str(path), sidecar=True) as db:
+            assert db.tags(0) == {"White": "Tal", "Result": "1-0"}
+        data = path.read_bytes().replace(b"Tal", b"Kas", 1).replace(b"1-0", b"0-1", 2)
+        mtime = path.stat().st_mtime_ns
+        path.write_bytes(data)
+        os.utime(str(path), ns=(mtime + 10 ** 9, mtime + 10 ** 9))
+        with PGNDatabase(str(path), sidecar=True) as db:
+            assert db.tags(0) == {"White": "Kas", "Result": "0-1"}
+            assert db[0].tag_pairs["White"] == "Kas"
+            assert len(db) == 501
+
+    def test_sidecar_corrupt(self, db_path):
+        with open(db_path + ".idx", "wb") as f:
+            f.write(b'not an index')
+        with PGNDatabase(db_path, sidecar=True) as db:
+            assert len(db) == 3
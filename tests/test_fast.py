@@ -0,0 +1,119 @@
+import glob
+import io
+import os
+import random
+import sys
+import pgn_parser.parser as parser
+import pgn_parser.stream as stream
+from pgn_parser import pgn
+from pgn_parser.pgn import Actions
+import pytest
+
+
+TEST_DATA = os.path.join(os.path.dirname(__file__), '..', 'features', 'steps', 'test_data')
+
+INPUTS = [
+    '',
+    '1. e4 e5',
+    '1.e4 e5 2.Nf3',
+    '1... e5 2. Nf3',
+    '[Event "Let\'s Play!"]\n[Site "chess.com"]\n{A game} 1. e4 e5 1-0',
+    '[ Site\n"chess.com"\t] 1. e4 *',
+    '1. e4 $1 $22 {white} (1. d4 d5 (1... Nf6)) e5 $2\n{black} (1... c5) {move} 2. Nf3 1/2-1/2',
+    '1. e8=Q+ exd1=N# 2. O-O-O O-O 3. Nbd2 R1e2 0-1  \n',
+    '1. e4  e5',
+    '1. e4\n\n\n\n\n\ne5',
+    '1. e4 ( ) e5',
+    '1. e4 {unclosed',
+    '1. e4 (1. d4',
+    '1. e4 $ e5',
+    '[Site "chess.com" 1. e4',
+    '1. e9',
+    '1. e4 e5 2-0',
+]
+
+
+def outcome(input, engine):
+    """The game parsed from input, as a comparable tuple, or the error raised"""
+    try:
+        game = parser.parse(input, actions=Actions(), engine=engine)
+    except parser.ParseError as e:
+        return 'error', str(e), e.position
+    plies = [(m.move_number, p.san, p.nags, p.comment, [str(v) for v in p.variations],
+              m.comment)
+             for m in game.movetext for p in (m.white, m.black)]
+    return str(game), list(game.tag_pairs.items()), game.comment, str(game.score), plies
+
+
+def random_game(rng):
+    """Stitches together a game, valid or not, from pieces of pgn"""
+    pieces = ['1.', '2.', '3...', ' ', ' ', '\n', '  ', 'e4', 'exd5', 'Nf3', 'O-O',
+              'e8=Q#', '$1', '{c}', '(', ')', '1-0', '*', '[A "b"]', '{', '}']
+    return '1. ' + ''.join(rng.choice(pieces) for _ in range(rng.randint(0, 16)))
+
+
+ENGINES = ['fast', 'direct']
+
+
+class TestFastEngine(object):
+    """Test the fast and direct engines build the same games and errors as the canopy one"""
+
+    @pytest.mark.parametrize("engine", ENGINES)
+    @pytest.mark.parametrize("input", INPUTS)
+    def test_inputs(self, input, engine):
+        assert outcome(input, engine) == outcome(input, 'canopy')
+        data = input.encode('utf-8')
+        assert outcome(data, engine) == outcome(data, 'canopy')
+
+    @pytest.mark.parametrize("engine", ENGINES)
+    @pytest.mark.parametrize("path", sorted(glob.glob(os.path.join(TEST_DATA, '*.pgn'))))
+    def test_test_data(self, path, engine):
+        for offset, line, text in stream.read_games(path):
+            assert outcome(text, engine) == outcome(text, 'canopy')
+
+    @pytest.mark.parametrize("engine", ENGINES)
+    def test_random_games(self, engine):
+        rng = random.Random(0)
+        for _ in range(500):
+            input = random_game(rng)
+            assert outcome(input, engine) == outcome(input, 'canopy')
+
+    def test_unknown_engine(self):
+        with pytest.raises(ValueError):
+            parser.parse('1. e4', actions=Actions(), engine='slow')
+
+    def test_iter_games(self):
+        path = os.path.join(TEST_DATA, 'cc1.pgn')
+        fast = [str(g) for g in pgn.iter_games(path, engine='fast')]
+        assert fast == [str(g) for g in pgn.iter_games(path)]
+
+    @pytest.mark.parametrize("engine", ENGINES)
+    def test_deep_variations(self, engine):
+        depth = 3 * sys.getrecursionlimit()
+        pgn = '1. e4 ' + '(1. d4 ' * depth + ')' * depth + ' e5 *'
+        game = parser.parse(pgn, actions=Actions(), engine=engine)
+        assert game.move(1).black.san == "e5"
+        ply = game.move(1).white
+        for _ in range(depth):
+            ply = ply.variations[0][0].white
+        assert ply.san == "d4"
+        assert str(game.movetext).startswith("1. e4 (1. d4 (1. d4")
+
+    @pytest.mark.parametrize("engine", ENGINES + ['canopy'])
+    def test_deep_variations_error(self, engine):
+        depth = 3 * sys.getrecursionlimit()
+        text = '1. e4 ' + '(1. d4 ' * depth + ')' * (depth - 1) + ' e5 *'
+        with pytest.raises(parser.ParseError) as error:
+            parser.parse(text, actions=Actions(), engine=engine)
+        assert error.value.expected == ['<less deeply nested variations>']
+        errors = []
+        games = list(pgn.iter_games(io.StringIO(text + '\n[Event "x"]\n1. d4 *'), engine=engine,
+                                    on_error=errors.append))
+        assert [g.move(1).white.san for g in games] == ["d4"]
+        assert len(errors) == 1
+
+    def test_direct_nags(self):
+        game = parser.parse('1. e4 $1 $2\n e5 {c} *', actions=Actions(), engine='direct')
+        assert game.move(1).white.nags == ["$1", "$2\n"]
+        assert game.move(1).black.nags == []
+        assert game.move(1).black.comment == "c"
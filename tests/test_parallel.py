@@ -0,0 +1,41 @@
+from pgn_parser.parallel import parse_many
+import gzip
+import pytest
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / "db.pgn"
+    games = ['[Round "{}"]\n\n1. e4 {{c}} e5 (1... c5) 1-0'.format(i) for i in range(50)]
+    path.write_text("\n\n".join(games))
+    return str(path)
+
+
+class TestParseMany:
+    """Test parsing a file across a pool of processes"""
+
+    def test_parse_many_ordered(self, db_path):
+        games = list(parse_many(db_path, workers=2, chunk_size=100))
+        assert [g.tag_pairs["Round"] for g in games] == [str(i) for i in range(50)]
+        assert games[0].move(1).white.comment == "c"
+
+    def test_parse_many_unordered(self, db_path):
+        games = list(parse_many(db_path, workers=2, ordered=False, chunk_size=100))
+        assert sorted(int(g.tag_pairs["Round"]) for g in games) == list(range(50))
+
+    def test_parse_many_reduce(self, db_path):
+        results = list(parse_many(db_path, workers=2, reduce=str, chunk_size=300))
+        assert len(results) == 50
+        assert results[3].startswith('[Round "3"]')
+
+    def test_parse_many_one_range(self, db_path):
+        games = list(parse_many(db_path, workers=1))
+        assert len(games) == 50
+
+    def test_parse_many_compressed(self, db_path):
+        with open(db_path, "rb") as f:
+            data = f.read()
+        with open(db_path + ".gz", "wb") as f:
+            f.write(gzip.compress(data))
+        games = list(parse_many(db_path + ".gz", workers=2, chunk_size=100))
+        assert [g.tag_pairs["Round"] for g in games] == [str(i) for i in range(50)]
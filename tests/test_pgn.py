@@ -1,5 +1,10 @@
 import pgn_parser.parser as parser
-from pgn_parser.pgn import Actions, Move, Score, Ply, PGNGameException
+import pgn_parser.pgn as pgn
+from pgn_parser.pgn import SANS, Actions, Move, Score, Ply, PGNGameException, GameError, GameFeeder, LiveGame, aiter_games, iter_games, iter_headers, parse_lazy, parse_tag_pairs, san_code
+import asyncio
+import gzip
+import io
+import pickle
 import pytest
 from unittest.mock import MagicMock
 
@@ -133,6 +138,24 @@ class TestGame:
         g = parser.parse(input, actions=Actions())
         assert str(g.move(35)) == "35. e4 e5"
 
+    def test_codes(self):
+        one = parser.parse("1. e4 (1. d4) e5 2. Nf3 Nc6 *", actions=Actions())
+        two = parser.parse("1. e4 e5 2. Nf3 Nf6 *", actions=Actions(), engine="direct")
+        assert one.codes().typecode == "H"
+        assert [SANS[c] for c in one.codes()] == ["e4", "e5", "Nf3", "Nc6"]
+        assert one.codes()[:3] == two.codes()[:3]
+        assert one.codes() != two.codes()
+
+    def test_codes_past_16_bits(self, monkeypatch):
+        monkeypatch.setattr(pgn, "SANS", [""])
+        monkeypatch.setattr(pgn, "_SAN_CODES", {"": 0})
+        for i in range(0xffff):
+            san_code("pad%d" % i)
+        game = parser.parse("1. e4 e5 *", actions=Actions())
+        assert game.codes().typecode == "I"
+        assert list(game.codes()) == [0x10000, 0x10001]
+        assert game.move(1).black.san == "e5"
+
     def test_get_move_0(self):
         """Given a move number retrieve that move"""
         input = '[Site "bmb.io"]\n{game comment} 35. e4 e5 36. d4 d5 37. c4 c5 {white wins} 1-0'
@@ -154,6 +177,47 @@ class TestGame:
         with pytest.raises(PGNGameException):
             g.move(39)
 
+    def test_get_move_irregular(self):
+        """The first move with the number is found, however moves are numbered"""
+        g = parser.parse('1. e4 3. d4 3. c4 2. Nf3 *', actions=Actions())
+        assert [g.move(n).white.san for n in (1, 2, 3)] == ["e4", "Nf3", "d4"]
+        g.movetext.insert(0, parser.parse('1. g3 *', actions=Actions()).movetext[0])
+        assert g.move(1).white.san == "g3"
+        with pytest.raises(PGNGameException):
+            g.move(4)
+
+    def test_ply(self):
+        g = parser.parse('31... Kf7 32. Rd1 Ke6 33. Rd2 *', actions=Actions(), engine="direct")
+        assert [g.ply(i).san for i in (61, 62, 63, 64)] == ["Kf7", "Rd1", "Ke6", "Rd2"]
+        assert g.ply(62).colour == "w"
+        for missing in (-1, 0, 60, 65, 66):
+            with pytest.raises(PGNGameException):
+                g.ply(missing)
+
+    def test_ply_split_move(self):
+        """A move split by a comment has its plies in two Moves"""
+        g = parser.parse('1. e4 {c} 1... e5 2. Nf3 *', actions=Actions())
+        assert [g.ply(i).san for i in (0, 1, 2)] == ["e4", "e5", "Nf3"]
+
+    def test_index_follows_changes(self):
+        g = parser.parse('1. e4 2. d4 3. c4 *', actions=Actions())
+        assert g.move(3).white.san == "c4"
+        g.movetext[1] = parser.parse('3. g3 *', actions=Actions()).movetext[0]
+        assert g.move(3).white.san == "g3"
+        assert g.ply(4).san == "g3"
+        g.movetext.sort(key=lambda m: -m.move_number)
+        assert g.move(3).white.san == "g3"
+        del g.movetext[:2]
+        assert g.move(1).white.san == "e4"
+        with pytest.raises(PGNGameException):
+            g.move(3)
+
+    def test_ply_variation(self):
+        g = parser.parse('31. Kf1 (31... Kf7 32. Rd1) Ke6 *', actions=Actions())
+        variation = g.move(31).white.variations[0]
+        assert variation.ply(62).san == "Rd1"
+        assert variation.move(32).white is variation.ply(62)
+
 
 class TestTagPairs:
     """Testing TagPair objects"""
@@ -189,6 +253,45 @@ class TestPly:
         p = Ply("1.", "e4", nags=make_nodes(["$1", "$19", "$139"]))
         assert p.nags == ["$1", "$19", "$139"]
 
+    def test_str_variations(self):
+        game = parser.parse("1. e4 $1 {c} (1. d4 d5 (1... Nf6) 2. c4) (1. c4 {e}) e5 *", actions=Actions())
+        assert str(game.move(1).white) == "e4 {c} $1 (1. d4 d5 (1... Nf6) 2. c4) (1. c4 {e})"
+        assert str(game.move(1)) == "1. e4 {c} $1 (1. d4 d5 (1... Nf6) 2. c4) (1. c4 {e}) e5"
+
+    @pytest.mark.parametrize("engine", ["canopy", "direct"])
+    def test_shared_empty(self, engine):
+        game = parser.parse("1. e4 $1 (1. d4) e5 2. d4 *", actions=Actions(), engine=engine)
+        e5, d4 = game.move(1).black, game.move(2).white
+        assert e5.nags == [] and e5.variations == []
+        assert e5.nags is e5.variations is d4.nags is d4.variations
+        with pytest.raises(TypeError):
+            e5.nags.append("$2")
+        e5.nags = ["$2"]
+        assert str(game.move(1)) == "1. e4 $1 (1. d4) e5 $2"
+        assert d4.nags == []
+
+    def test_san_code(self):
+        game = parser.parse("1. e4 e5 2. Nf3 Nc6 3. e4 *", actions=Actions())
+        e4 = game.move(1).white
+        assert e4.code == game.move(3).white.code == san_code("e4")
+        assert SANS[e4.code] == e4.san == "e4"
+        assert game.move(3).black.code == 0
+        e4.san = "d4"
+        assert e4.code == san_code("d4")
+        assert str(game.move(1)) == "1. d4 e5"
+
+    def test_pickle_san(self):
+        ply = Ply("w", "Qxh7#", comment="mate")
+        state = pickle.loads(pickle.dumps(ply)).__getstate__()
+        assert state == ("w", "Qxh7#", [], "mate", [])
+        assert "Qxh7#" in str(pickle.dumps(ply))
+
+    def test_slots(self):
+        p = Ply("w", "e4")
+        assert not hasattr(p, "__dict__")
+        with pytest.raises(AttributeError):
+            p.extra = 1
+
 
 class TestScore:
     """Testing the construction of a Score object"""
@@ -204,3 +307,224 @@ class TestScore:
         assert Score("1/2-1/2").black == "1/2"
         assert Score("1/2-1/2").result == "1/2-1/2"
         assert Score("*").result == "*"
+
+
+class TestIterGames:
+    """Testing parsing every game of a multi game file"""
+
+    def test_iter_games(self, tmp_path):
+        path = tmp_path / "db.pgn"
+        path.write_text('[Site "a"]\n\n1. e4 e5 1-0\n\n[Site "b"]\n\n1. d4 {c} d5 0-1\n')
+        games = list(iter_games(str(path), chunk_size=5))
+        assert [g.tag_pairs["Site"] for g in games] == ["a", "b"]
+        assert games[1].move(1).white.comment == "c"
+        assert games[1].score.result == "0-1"
+
+    def test_iter_games_text_file(self):
+        games = list(iter_games(io.StringIO('1. e4 *\n1. d4 *')))
+        assert [g.move(1).white.san for g in games] == ["e4", "d4"]
+
+    def test_iter_games_where(self):
+        db = '[Result "1-0"]\n\n1. e4 1-0\n[Result "0-1"]\n\n1. d4 0-1\n[Result "1-0"]\n\n1. c4 1-0'
+        games = list(iter_games(io.BytesIO(db.encode()), where=lambda tags: tags["Result"] == "1-0"))
+        assert [g.move(1).white.san for g in games] == ["e4", "c4"]
+
+    def test_iter_games_where_skips_bad_movetext(self):
+        """A game that is not wanted is never parsed past its tag pairs"""
+        db = '[Site "bad"]\n\n1. e4 ! ! 1-0\n[Site "good"]\n\n1. d4 0-1'
+        games = list(iter_games(io.StringIO(db), where=lambda tags: tags["Site"] == "good"))
+        assert len(games) == 1
+
+    def test_iter_games_on_error(self):
+        db = '[Site "a"]\n\n1. e4 1-0\n\n[Site "b"]\n\n1. e4 e5\n2. Nf3 ?? 1-0\n\n[Site "c"]\n\n1. d4 0-1'
+        errors = []
+        games = list(iter_games(io.BytesIO(db.encode()), on_error=errors.append, chunk_size=8))
+        assert [g.tag_pairs["Site"] for g in games] == ["a", "c"]
+        assert len(errors) == 1
+        e = errors[0]
+        assert isinstance(e, GameError)
+        assert repr(e).startswith("GameError(game 1, line 8, column 8: expected ")
+        assert (e.index, e.line, e.column) == (1, 8, 8)
+        assert db[e.offset:e.offset + 2] == "??"
+        assert '"1-0"' in e.expected
+
+    @pytest.mark.parametrize("bad", ['1. e4 (1. d4 e5 1-0', '1. e4 {oops e5 1-0'])
+    def test_iter_games_on_error_resyncs(self, bad):
+        """A game left inside a variation or comment does not swallow those after it"""
+        good = ['[Site "{}"]\n\n1. e4 e5 1-0'.format(i) for i in range(5)]
+        db = '[Site "bad"]\n\n' + bad + '\n\n' + '\n\n'.join(good) + '\n'
+        errors = []
+        games = list(iter_games(io.StringIO(db), on_error=errors.append, chunk_size=7))
+        assert [g.tag_pairs["Site"] for g in games] == ["0", "1", "2", "3", "4"]
+        assert len(errors) == 1
+
+    def test_iter_games_raises(self):
+        with pytest.raises(parser.ParseError):
+            list(iter_games(io.StringIO('1. e4 ?? 1-0')))
+
+
+class TestLazyGame:
+    """Testing games whose movetext is parsed when first used"""
+
+    @pytest.mark.parametrize("pgn", ['[Site "a"]\n\n{gc} 1. e4 e5 1/2-1/2 \n', b'[Site "b"]\n1. d4 0-1',
+                                     '1. c4 *', '1. e4'])
+    def test_same_as_parse(self, pgn):
+        lazy, game = parse_lazy(pgn), parser.parse(pgn, actions=Actions())
+        assert dict(lazy.tag_pairs) == dict(game.tag_pairs)
+        assert str(lazy.score) == str(game.score)
+        assert not lazy.loaded
+        assert str(lazy) == str(game)
+        assert lazy.comment == game.comment
+        assert lazy.loaded
+
+    def test_movetext_on_use(self):
+        lazy = parse_lazy('[Site "a"]\n\n1. e4 ?? 1-0', engine="direct")
+        assert lazy.tag_pairs["Site"] == "a"
+        assert lazy.score.result == "1-0"
+        with pytest.raises(parser.ParseError):
+            lazy.move(1)
+
+    def test_set_movetext(self):
+        lazy = parse_lazy('{c} 1. e4 *')
+        lazy.movetext = parser.parse('1. d4 *', actions=Actions()).movetext
+        assert str(lazy) == "{c} 1. d4 *"
+
+    def test_iter_games_lazy(self):
+        db = '[Site "a"]\n\n1. e4 1-0\n[Site "b"]\n\n1. d4 ?? 0-1\n[Site "c"]\n\n1. c4 *'
+        games = list(iter_games(io.StringIO(db), lazy=True, where=lambda tags: tags["Site"] != "c"))
+        assert [(g.tag_pairs["Site"], g.score.result) for g in games] == [("a", "1-0"), ("b", "0-1")]
+        assert games[0].move(1).white.san == "e4"
+        with pytest.raises(parser.ParseError):
+            games[1].movetext
+
+
+class TestIterHeaders:
+    """Testing parsing only the tag pairs of every game"""
+
+    def test_iter_headers(self):
+        db = '[White "a"]\n[Result "1-0"]\n\n1. e4 {[Black "x"]} e5 1-0\n\n[White "b"]\n\n1. d4 (1. c4) *'
+        headers = list(iter_headers(io.BytesIO(db.encode())))
+        assert [h["White"] for h in headers] == ["a", "b"]
+        assert headers[0]["Result"] == "1-0"
+        assert "Black" not in headers[0]
+
+    def test_parse_tag_pairs(self):
+        tps = parse_tag_pairs('[Site "x"]\n[Date "now"]\n\n1. this is not movetext')
+        assert list(tps.items()) == [("Site", "x"), ("Date", "now")]
+
+
+class TestAiterGames:
+    """Testing parsing games arriving on an asyncio stream"""
+
+    def run(self, data, **kwargs):
+        async def collect():
+            reader = asyncio.StreamReader()
+            for i in range(0, len(data), 4):
+                reader.feed_data(data[i:i + 4])
+            reader.feed_eof()
+            return [g async for g in aiter_games(reader, chunk_size=4, **kwargs)]
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(collect())
+        finally:
+            loop.close()
+
+    def test_aiter_games(self):
+        db = b'[Site "a"]\n\n1. e4 {c} e5 1-0\n\n[Site "b"]\n\n1. d4 (1. c4) d5 0-1\n1. f4'
+        games = self.run(db, max_pending=1)
+        assert [g.tag_pairs.get("Site") for g in games] == ["a", "b", None]
+        assert games[2].move(1).white.san == "f4"
+
+    def test_aiter_games_compressed(self):
+        games = self.run(gzip.compress(b'1. e4 *\n1. d4 *'))
+        assert [g.move(1).white.san for g in games] == ["e4", "d4"]
+
+
+class TestLiveGame:
+    """Testing re-parsing a game as moves are added to it"""
+
+    HEAD = '[Event "Live"]\n[Result "*"]\n\n'
+
+    def test_update(self):
+        live = LiveGame()
+        pgn = self.HEAD + '1. e4 {[%clk 1:00]} e5 (1... c5) 2. Nf3'
+        for text in [pgn + ' *', pgn + ' Nc6 *', pgn + ' Nc6 3. Bb5 {Ruy} *']:
+            game = live.update(text)
+            assert str(game) == str(parser.parse(text, actions=Actions()))
+        assert live.game.move(3).white.comment == "Ruy"
+        assert live._moves[-1].white.san == "Nf3"
+
+    def test_reuses_moves(self):
+        live = LiveGame()
+        first = live.update(self.HEAD + '1. e4 e5 2. Nf3 *')
+        second = live.update(self.HEAD.replace('*', '1-0') + '1. e4 e5 2. Nf3 Nc6 1-0')
+        assert second.move(1) is first.move(1)
+        assert second.move(2).black.san == "Nc6"
+        assert second.tag_pairs["Result"] == "1-0"
+        assert str(first.move(2)) == "2. Nf3"
+
+    def test_rewritten(self):
+        live = LiveGame()
+        live.update(b'1. e4 e5 2. Nf3 *')
+        game = live.update(b'1. d4 d5 2. c4 *')
+        assert str(game.move(1)) == "1. d4 d5"
+
+    def test_error(self):
+        live = LiveGame()
+        live.update('1. e4 e5 *')
+        with pytest.raises(parser.ParseError):
+            live.update('1. e4 e5 2. Nf3 {unclosed')
+        assert live.game.move(1).black.san == "e5"
+
+
+class TestGameFeeder:
+    """Testing parsing games from input pushed in chunks"""
+
+    DB = '[White "a"]\n\n1. e4 {a comment} e5 1-0\n\n[White "b"]\n\n1. d4 (1. c4) d5\n\n[White "c"]\n\n1. c4\n'
+
+    def test_bytewise(self):
+        feeder = GameFeeder()
+        games = []
+        for i in range(len(self.DB)):
+            games += feeder.feed(self.DB[i])
+        assert len(games) == 2
+        games += feeder.close()
+        assert [g.tag_pairs["White"] for g in games] == ["a", "b", "c"]
+        assert str(games[1].move(1).white.variations[0]) == "1. c4 "
+
+    def test_emitted_on_score(self):
+        feeder = GameFeeder()
+        assert list(feeder.feed('1. e4 e5 1-')) == []
+        assert [str(g.score) for g in feeder.feed('0 [White')] == ["1-0"]
+
+    def test_emitted_at_once(self):
+        feeder = GameFeeder()
+        assert [str(g.score) for g in feeder.feed('[White "a"]\n\n1. e4 e5 1-0\n')] == ["1-0"]
+        assert [str(g.score) for g in feeder.feed('1. e4 e5 1/2-1/2')] == ["1/2-1/2"]
+        assert list(feeder.feed('1. e4 e5 1/2-1')) == []
+        assert [str(g.score) for g in feeder.feed('/2')] == ["1/2-1/2"]
+
+    def test_gzip_chunks(self):
+        data = gzip.compress(self.DB.encode())
+        feeder = GameFeeder()
+        games = []
+        for i in range(0, len(data), 7):
+            games += feeder.feed(data[i:i + 7])
+        games += feeder.close()
+        assert [g.tag_pairs["White"] for g in games] == ["a", "b", "c"]
+
+    def test_error_keeps_rest(self):
+        feeder = GameFeeder()
+        games = feeder.feed(self.DB.replace("1. d4", "1. d9"))
+        assert next(games).tag_pairs["White"] == "a"
+        with pytest.raises(parser.ParseError):
+            next(games)
+        assert [g.tag_pairs["White"] for g in feeder.close()] == ["c"]
+
+    def test_on_error(self):
+        errors = []
+        feeder = GameFeeder(on_error=errors.append)
+        games = list(feeder.feed(self.DB.replace("1. d4", "1. d9"))) + list(feeder.close())
+        assert len(games) == 2
+        assert errors[0].index == 1
+        assert errors[0].line == 7
@@ -365,4 +365,196 @@ class TestGame:
         m1 = game.move(1)
         assert m1.white.san == "e4"
         assert m1.white.comment == "a comment"
-        assert m1.comment == "move one"
\ No newline at end of file
+        assert m1.comment == "move one"
+
+class TestParseRule:
+    """Test parsing a single rule of the grammar"""
+
+    def test_parse_rule(self):
+        p = parser.Parser('[Site "x"]\n1. e4 *', Actions(), None)
+        tag_pairs, end = p.parse_rule('tag_pairs')
+        assert tag_pairs["Site"] == "x"
+        assert end == 11
+
+    def test_parse_rule_offset(self):
+        p = parser.Parser('[Site "x"]\n1. e4 *', Actions(), None)
+        movetext, end = p.parse_rule('movetext', 11)
+        assert movetext[0].white.san == "e4"
+
+    def test_parse_rule_fails(self):
+        p = parser.Parser('1. e4 *', Actions(), None)
+        with pytest.raises(parser.ParseError):
+            p.parse_rule('score')
+
+
+class TestParseBytes:
+    """Test parsing bytes without decoding them first"""
+
+    def test_parse_bytes(self):
+        game = parser.parse('[White "Réti"]\n1. Nf3 {à la} d5 *'.encode(), actions=Actions())
+        assert game.tag_pairs["White"] == "Réti"
+        assert game.move(1).white.comment == "à la"
+        assert game.move(1).black.san == "d5"
+
+    def test_parse_bytes_encoding(self):
+        game = parser.parse('[White "Réti"]\n1. Nf3 *'.encode('cp1252'), actions=Actions(), encoding='cp1252')
+        assert game.tag_pairs["White"] == "Réti"
+
+    def test_parse_bytes_fallback(self):
+        """Latin-1 text in a file read as utf-8 is still decoded"""
+        game = parser.parse('[White "Réti"]\n1. Nf3 *'.encode('latin-1'), actions=Actions())
+        assert game.tag_pairs["White"] == "Réti"
+
+    @pytest.mark.parametrize("engine", ['canopy', 'fast', 'direct'])
+    @pytest.mark.parametrize("encoding", ['latin-1', 'cp1252'])
+    def test_parse_bytes_one_char(self, engine, encoding):
+        """A one character value is decoded like any other"""
+        data = '[White "é"]\n1. e4 {é} *'.encode(encoding)
+        game = parser.parse(data, actions=Actions(), encoding=encoding, engine=engine)
+        assert game.tag_pairs["White"] == "é"
+        assert game.move(1).white.comment == "é"
+        game = parser.parse(data, actions=Actions(), engine=engine)
+        assert game.tag_pairs["White"] == "é"
+
+    @pytest.mark.parametrize("engine", ['canopy', 'fast', 'direct'])
+    def test_parse_bytes_non_ascii_space(self, engine):
+        """A byte that decodes to whitespace is not whitespace to the grammar"""
+        with pytest.raises(parser.ParseError) as e:
+            parser.parse(b'1. e4\xa0e5 *', actions=Actions(), engine=engine)
+        assert e.value.position == 5
+
+    def test_parse_memoryview(self):
+        data = memoryview(b'xx[Site "x"]\n1. e4 e5 1-0')[2:]
+        game = parser.parse(data, actions=Actions())
+        assert game.tag_pairs["Site"] == "x"
+        assert game.score.result == "1-0"
+
+    def test_parse_bytes_error(self):
+        with pytest.raises(parser.ParseError):
+            parser.parse(b'1. e4 {comment} ?', actions=Actions())
+
+
+class TestMemo:
+    """Test the rules memoized and the sliding window don't change the result"""
+
+    PGN = '[Site "x"]\n1. e4 {a} (1. d4 d5 (1... Nf6)) e5 $1 {b} 2. Nf3 (2. f4) Nc6 {c} 1-0'
+
+    @pytest.mark.parametrize("memo", [None, parser.MEMO_RULES, frozenset()])
+    @pytest.mark.parametrize("window", [False, True])
+    def test_same_game(self, memo, window):
+        game = parser.parse(self.PGN, actions=Actions(), memo=memo, window=window)
+        assert str(game) == str(parser.parse(self.PGN, actions=Actions()))
+
+    def test_window_evicts(self):
+        pgn = " ".join("{}. e4 {{c}} (1. d4) e5".format(i) for i in range(1, 200))
+        p = parser.Parser(pgn, Actions(), None, memo=None, window=True)
+        p.parse()
+        assert p._cache.size() < 20
+
+    def test_no_memo_table(self):
+        p = parser.Parser("1. e4", Actions(), None)
+        p.parse()
+        assert p._cache['dlm'].get(0) is None
+        assert p._cache['comment'].get(5) is not None
+
+    def test_window_error(self):
+        with pytest.raises(parser.ParseError) as e:
+            parser.parse("1. e4 e5 2. Nf3 (2. f4", actions=Actions(), window=True)
+        assert e.value.position == 22
+
+
+class TestTreeNode:
+    """Test tree nodes as spans of the input"""
+
+    def test_span_text(self):
+        node = parser.TreeNode("1. e4 e5", 3, None, 5)
+        assert node.text == "e4"
+        assert node.elements == ()
+
+    def test_given_text(self):
+        node = parser.TreeNode("e4", 3)
+        assert node.text == "e4"
+        assert node.end == 5
+
+    def test_slots(self):
+        tree = parser.Parser("1. e4 e5", None, None).parse_rule('move')[0]
+        assert isinstance(tree, parser.TreeNode3)
+        assert tree.text == "1. e4 e5"
+        assert tree.white.text == "e4"
+        assert not hasattr(tree, '__dict__')
+
+
+class TestRuns:
+    """Test runs of a character class are matched in one step"""
+
+    def test_long_comment(self):
+        note = "[%eval 0.31] " + "x" * 2000
+        game = parser.parse("1. e4 {" + note + "} e5 *", actions=Actions())
+        assert game.move(1).white.comment == note
+
+    def test_run_node(self):
+        tree, end = parser.Parser('[Event "A long name"]', None, None).parse_rule('value', 8)
+        assert tree.text == "A long name"
+        assert tree.elements == ()
+        assert end == 19
+
+    def test_unclosed_value(self):
+        with pytest.raises(parser.ParseError) as e:
+            parser.parse(b'[Event "A long name]', actions=Actions())
+        assert e.value.position == 20
+        assert e.value.expected == ['[^\\"]', '"\\""']
+
+
+class TestTrack:
+    """Test errors are the same whether or not expected tokens are tracked"""
+
+    @pytest.mark.parametrize("pgn", ['1. e4 e5 ?', '[Site "x"', '1. e4 (1. d4', b'1. e4 {c'])
+    def test_same_error(self, pgn):
+        errors = []
+        for track in (True, False):
+            with pytest.raises(parser.ParseError) as e:
+                parser.Parser(pgn, Actions(), None, track=track).parse()
+            errors.append((str(e.value), e.value.position, e.value.expected))
+        assert errors[0] == errors[1]
+
+    def test_parse_rule_error(self):
+        p = parser.Parser('[Site "x"]', Actions(), None)
+        with pytest.raises(parser.ParseError) as e:
+            p.parse_rule('move')
+        assert e.value.expected == ['[0-9]']
+
+    def test_nothing_tracked(self):
+        p = parser.Parser('1. e4 e5', Actions(), None)
+        p.parse()
+        assert p._expected == []
+
+
+class TestParseBatch:
+    """Test parse_batch gives what parse does for each input"""
+
+    GAMES = ['1. e4 e5 *', b'[Site "x"] 1. d4 1-0', '', '1. e4 (1. d4) e5 $1 {c} 0-1']
+
+    @pytest.mark.parametrize("engine", ['canopy', 'fast', 'direct'])
+    def test_same_as_parse(self, engine):
+        games = parser.parse_batch(self.GAMES, actions=Actions(), engine=engine)
+        assert [str(g) for g in games] == [str(parser.parse(g, actions=Actions()))
+                                          for g in self.GAMES]
+
+    def test_error(self):
+        games = parser.parse_batch(['1. e4 *', '1. e4 ?', '1. d4 *'], actions=Actions())
+        assert str(next(games)) == '1. e4 *'
+        with pytest.raises(parser.ParseError) as e:
+            next(games)
+        assert e.value.position == 6
+
+    def test_reset_after_error(self):
+        p = parser.Parser('1. e4 ?', Actions(), None)
+        with pytest.raises(parser.ParseError):
+            p.parse()
+        p.reset('1. d4 *')
+        assert str(p.parse()) == '1. d4 *'
+        assert p._expected == []
+
+    def test_unknown_engine(self):
+        with pytest.raises(ValueError):
+            list(parser.parse_batch(['1. e4'], engine='slow'))
@@ -0,0 +1,117 @@
+import pgn_parser.stream as stream
+import bz2
+import gzip
+import io
+import lzma
+import pytest
+
+
+GAMES = ['[Event "one"]\n[Site "x"]\n\n1. e4 {a [%clk 0:03:00] 1-0} e5 (1... c5 0-1) 1-0',
+         '[Event "two"]\n\n1. d4 d5 *',
+         '[Event "three"]\n\n1. c4 {no score}',
+         '[Event "four"]\n\n1. Nf3 1/2-1/2']
+DB = "\n\n".join(GAMES) + "\n"
+
+
+class TestScanGames:
+    """Test finding the boundaries of games"""
+
+    def test_scan_games(self):
+        starts, ends = [], []
+        assert stream.scan_games(DB, 0, True, starts, ends) == len(DB)
+        assert [DB[s:e] for s, e in zip(starts, ends)] == GAMES
+
+    def test_scan_games_bytes(self):
+        db = DB.encode()
+        starts, ends = [], []
+        stream.scan_games(db, 0, True, starts, ends)
+        assert [db[s:e].decode() for s, e in zip(starts, ends)] == GAMES
+
+    def test_scan_games_unfinished(self):
+        """Without the rest of the input, a game with no score is unfinished"""
+        db = GAMES[0] + "\n" + GAMES[1][:-2]
+        starts, ends = [], []
+        stop = stream.scan_games(db, 0, False, starts, ends)
+        assert len(starts) == 1
+        assert db[stop:] == GAMES[1][:-2]
+
+    def test_game_end_tag_in_comment(self):
+        game = '1. e4 {[%eval 0.3]} e5 *'
+        assert stream.game_end(game, 0) == len(game)
+
+    def test_game_end_score_in_movenumber(self):
+        game = '10. e4 e5 11. d4 *'
+        assert stream.game_end(game, 0) == len(game)
+
+
+class TestResync:
+    """Test a game left inside a variation or comment ends at the next game"""
+
+    @pytest.mark.parametrize("bad", ['1. e4 (1. d4 e5 1-0', '1. e4 {oops e5 1-0'])
+    def test_scan_games(self, bad):
+        db = '[Site "a"]\n\n' + bad + '\n\n' + DB
+        starts, ends = [], []
+        stream.scan_games(db, 0, True, starts, ends)
+        assert [db[s:e] for s, e in zip(starts, ends)] == ['[Site "a"]\n\n' + bad] + GAMES
+
+    @pytest.mark.parametrize("bad", ['1. e4 (1. d4 e5 1-0', '1. e4 {oops e5 1-0'])
+    def test_splitter(self, bad):
+        db = '[Site "a"]\n\n' + bad + '\n\n' + DB
+        splitter = stream.Splitter()
+        games = []
+        for c in db:
+            games += splitter.feed(c)
+        games += splitter.close()
+        assert [g for o, l, g in games] == ['[Site "a"]\n\n' + bad] + GAMES
+
+    def test_tag_in_variation(self):
+        game = '1. e4 (1. d4 [%clk 0:01]\n[%eval 0.3]) e5 *'
+        assert stream.game_end(game, 0) == len(game)
+
+
+class TestSplitter:
+    """Test splitting games out of chunked input"""
+
+    def test_feed_every_char(self):
+        splitter = stream.Splitter()
+        games = []
+        for c in DB:
+            games += splitter.feed(c)
+        games += splitter.close()
+        assert [g for o, l, g in games] == GAMES
+        assert [DB[o:o + len(g)] for o, l, g in games] == GAMES
+        assert [l for o, l, g in games] == [1 + DB.count("\n", 0, o) for o, l, g in games]
+
+    def test_read_games(self):
+        games = list(stream.read_games(io.BytesIO(DB.encode()), chunk_size=7))
+        assert [g.decode() for o, l, g in games] == GAMES
+
+
+class TestDecompressor:
+    """Test detecting and undoing compression"""
+
+    @pytest.mark.parametrize("compress", [gzip.compress, bz2.compress, lzma.compress])
+    def test_read_games_compressed(self, compress):
+        games = list(stream.read_games(io.BytesIO(compress(DB.encode())), chunk_size=3))
+        assert [g.decode() for o, l, g in games] == GAMES
+
+    def test_concatenated_streams(self):
+        data = gzip.compress(DB.encode()) + gzip.compress(DB.encode())
+        d = stream.Decompressor()
+        out = b"".join(d.feed(data[i:i + 10]) for i in range(0, len(data), 10)) + d.close()
+        assert out == (DB + DB).encode()
+
+    def test_uncompressed_passes_through(self):
+        d = stream.Decompressor()
+        assert d.feed(b"1. e") == b""
+        assert d.feed(b"4 e5") == b"1. e4 e5"
+        assert d.close() == b""
+
+    def test_short_input(self):
+        d = stream.Decompressor()
+        assert d.feed(b"*") == b""
+        assert d.close() == b"*"
+
+    def test_is_compressed(self):
+        assert stream.is_compressed(gzip.compress(b"1. e4 *")[:6])
+        assert not stream.is_compressed(b"[Site ")